@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for each stage of dataview's load -> slice -> filter -> render
+pipeline, run headless over the synthetic files made in conftest.py.
+
+Needs pytest-benchmark: "python -m pytest benchmarks" from the top of the
+repository. Add "--benchmark-autosave" to keep the results, and
+"--benchmark-compare" to compare against the last saved run.
+"""
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+import dataview
+
+
+#(horizontal axis, vertical axis) of each plot type
+PLOT_AXES = {'1D': ('time', None), '2D': ('time', 'shots')}
+
+
+def set_plot(w, plot_type, avg=()):
+    """Set up the window's plot type, axes and averaged axes, and replot."""
+    haxis, vaxis = PLOT_AXES[plot_type]
+    w.plottype_field.setCurrentIndex(0 if plot_type == '1D' else 1)
+    w.dropdown1.setCurrentIndex(w.dropdown1.findText(haxis))
+    if vaxis is not None:
+        w.dropdown2.setCurrentIndex(w.dropdown2.findText(vaxis))
+    for ax in w.axes:
+        ax['avgcheckbox'].setChecked(ax['name'] in avg)
+    #The changes only schedule a replot
+    w.redraw.flush()
+
+
+def test_load_file(benchmark, window, datafile):
+    #Opening a file (as the file dialog does) up to its first plot
+    def load():
+        window.loadFile(datafile)
+        window.redraw.flush()
+    benchmark(load)
+
+
+@pytest.mark.parametrize('cache', ['cold', 'cached'])
+@pytest.mark.parametrize('plot_type', ['1D', '2D'])
+def test_get_data(benchmark, loaded_window, plot_type, cache):
+    w = loaded_window
+    set_plot(w, plot_type)
+
+    def setup():
+        if cache == 'cold':
+            w.slice_cache.clear()
+    benchmark.pedantic(w.getData, setup=setup, rounds=10, warmup_rounds=1)
+
+
+@pytest.mark.parametrize('block_bytes', [dataview.AVG_BLOCK_BYTES, 2**20])
+def test_get_data_average(benchmark, loaded_window, block_bytes):
+    #1D time traces averaged over every shot
+    w = loaded_window
+    w.avg_block_bytes = block_bytes
+    set_plot(w, '1D', avg=('shots',))
+    benchmark.pedantic(w.getData, setup=w.slice_cache.clear, rounds=10,
+                       warmup_rounds=1)
+
+
+@pytest.mark.parametrize('float32', [False, True])
+@pytest.mark.parametrize('function', ['units', 'lowpass', 'highpass'])
+@pytest.mark.parametrize('plot_type', ['1D', '2D'])
+def test_apply_data_functions(benchmark, loaded_window, plot_type, function,
+                              float32):
+    w = loaded_window
+    set_plot(w, plot_type)
+    w.float32Act.setChecked(float32)
+    if function == 'units':
+        w.data_unit_field.setText('mV')
+        w.updateDataUnits()
+    elif function == 'lowpass':
+        w.lowpass_checkbox.setChecked(True)
+    elif function == 'highpass':
+        w.highpass_checkbox.setChecked(True)
+    benchmark(w.applyDataFunctions)
+
+
+@pytest.mark.parametrize('layout', ['new', 'reuse'])
+def test_plot1D(benchmark, loaded_window, layout):
+    #'new' builds the axes and line from scratch, 'reuse' updates them (as
+    #when stepping through a file)
+    w = loaded_window
+    set_plot(w, '1D')
+
+    def setup():
+        if layout == 'new':
+            w.clearCanvas(draw=False)
+    benchmark.pedantic(w.plot1D, setup=setup, rounds=10, warmup_rounds=1)
+
+
+@pytest.mark.parametrize('layout', ['new', 'reuse'])
+def test_plot2D(benchmark, loaded_window, layout):
+    w = loaded_window
+    set_plot(w, '2D')
+
+    def setup():
+        if layout == 'new':
+            w.clearCanvas(draw=False)
+    benchmark.pedantic(w.plot2D, setup=setup, rounds=10, warmup_rounds=1)
+
+
+@pytest.mark.parametrize('plot_type', ['1D', '2D'])
+def test_render_figure(benchmark, datafile, plot_type):
+    #The whole pipeline without the GUI, as dataview-render does it
+    session = dataview.H5Session(datafile)
+    config = dataview.default_plot_config()
+    config['plot_type'] = plot_type
+    config['axes'] = [name for name in PLOT_AXES[plot_type] if name is not None]
+    try:
+        benchmark(dataview.render_figure, session, config)
+    finally:
+        session.close()
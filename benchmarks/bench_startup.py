@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup benchmark for dataview: time from a fresh python process to the
+window being shown, and to the first plot of a file being drawn.
+
+Each repeat runs in a new interpreter so import time is included.
+"python bench_startup.py -h" for options.
+"""
+
+import sys
+import os
+import time
+import json
+import argparse
+import subprocess
+import statistics
+
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE_FILE = os.path.join(REPO, 'dataview', 'example_data.hdf5')
+
+#Modules that are slow to import, and so shouldn't be needed to show the window
+SLOW_MODULES = ['astropy.units', 'scipy.ndimage']
+
+STAGES = ['import', 'window', 'plot']
+
+
+def child(filepath, t_spawn):
+    """Run in the new process: open the window, plot filepath and print the
+    time each stage finished (seconds since t_spawn) as JSON."""
+    times = {}
+    sys.path.insert(0, os.path.join(REPO, 'dataview'))
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    import dataview
+    from PyQt5 import QtWidgets
+    times['import'] = time.time() - t_spawn
+
+    app = QtWidgets.QApplication.instance()
+    if app is None:
+        app = QtWidgets.QApplication(sys.argv)
+    w = dataview.ApplicationWindow()
+    w.show()
+    app.processEvents()
+    times['window'] = time.time() - t_spawn
+    loaded = [name for name in SLOW_MODULES if name in sys.modules]
+
+    drawn = []
+    w.canvas.mpl_connect('draw_event', lambda event: drawn.append(time.time()))
+    w.loadFile(filepath)
+    #Data is read on a worker thread, so wait for the plot to be drawn
+    timeout = time.time() + 60
+    while not drawn and time.time() < timeout:
+        app.processEvents()
+        time.sleep(0.001)
+    times['plot'] = drawn[0] - t_spawn if drawn else None
+
+    print(json.dumps({'times': times, 'loaded_at_window': loaded}))
+
+
+def run(filepath, repeats=5, python=sys.executable):
+    """Start the GUI repeats times, returns a list of the child results."""
+    results = []
+    for i in range(repeats):
+        t_spawn = time.time()
+        proc = subprocess.run([python, os.path.abspath(__file__), '--child',
+                               filepath, '--spawn', repr(t_spawn)],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              universal_newlines=True, check=True)
+        #The child's last line of output is its result
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def summarize(results):
+    summary = {}
+    for stage in STAGES:
+        values = [r['times'][stage] for r in results
+                  if r['times'].get(stage) is not None]
+        if len(values) > 0:
+            summary[stage] = {'min': min(values),
+                              'median': statistics.median(values),
+                              'max': max(values)}
+    summary['loaded_at_window'] = sorted(set(name for r in results
+                                             for name in r['loaded_at_window']))
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time dataview's startup: "
+                                     "time to first window and first plot.")
+    parser.add_argument('file', nargs='?', default=EXAMPLE_FILE,
+                        help='hdf5 file to plot (default: the example data)')
+    parser.add_argument('-n', '--repeats', type=int, default=5,
+                        help='number of fresh processes to time')
+    parser.add_argument('--json', help='also save the results to this JSON file')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--spawn', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        child(args.child, args.spawn)
+        return 0
+
+    results = run(os.path.abspath(args.file), repeats=args.repeats)
+    summary = summarize(results)
+
+    print("{} runs of {}".format(args.repeats, args.file))
+    for stage in STAGES:
+        if stage in summary:
+            s = summary[stage]
+            print("  time to {:<7s} min {:.3f} s  median {:.3f} s  max {:.3f} s".format(
+                stage, s['min'], s['median'], s['max']))
+    print("  slow modules loaded with the window: "
+          + (', '.join(summary['loaded_at_window']) or 'none'))
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump({'file': args.file, 'runs': results, 'summary': summary},
+                      f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
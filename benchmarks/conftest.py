@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures for the dataview benchmarks: synthetic files in the UCLAHEDP
+layout (as in dataview/example_data.hdf5) and a headless window to
+plot them in.
+"""
+
+import os
+import sys
+from collections import OrderedDict
+
+import numpy as np
+import h5py
+import pytest
+
+#No display is needed: the window is drawn offscreen (with the Agg renderer
+#behind FigureCanvasQTAgg)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO, 'dataview'))
+
+
+#Axes of every synthetic file, in order, with their units
+AXES = [('shots', ''), ('time', 's'), ('chan', '')]
+DT = 4e-9
+
+#name: (shape, chunks, compression) of the data dataset
+FILE_CASES = OrderedDict([
+    ('example', ((50, 2500, 1), (1, 2500, 1), 'gzip')),
+    ('contiguous', ((20, 100000, 2), None, None)),
+    ('chunked', ((20, 100000, 2), (1, 10000, 1), None)),
+    ('gzip', ((20, 100000, 2), (1, 10000, 1), 'gzip')),
+    ('lzf', ((20, 100000, 2), (1, 10000, 1), 'lzf')),
+    ('wide', ((400, 20000, 1), (20, 2000, 1), 'gzip')),
+    ])
+
+
+def make_file(path, shape, chunks=None, compression=None, dtype='f4', seed=0):
+    """Write a UCLAHEDP-style file: a 'data' dataset with 'dimensions' and
+    'unit' attributes, plus one dataset (with a 'unit' attribute) per axis.
+    The data is a noisy sine wave in time, so the filters have something
+    to do."""
+    rng = np.random.default_rng(seed)
+    with h5py.File(path, 'w') as f:
+        for (name, unit), n in zip(AXES, shape):
+            if name == 'time':
+                values = np.arange(n)*DT
+            else:
+                values = np.arange(n)
+            axis = f.create_dataset(name, data=values.astype(np.float32))
+            axis.attrs['unit'] = unit
+
+        data = f.create_dataset('data', shape=shape, dtype=dtype,
+                                chunks=chunks, compression=compression)
+        data.attrs['dimensions'] = np.array([name for name, unit in AXES], dtype='S')
+        data.attrs['unit'] = 'V'
+
+        wave = np.sin(2*np.pi*np.arange(shape[1])/1000.0)
+        #Written one shot at a time to keep memory down
+        for shot in range(shape[0]):
+            noise = 0.1*rng.standard_normal((shape[1], shape[2]))
+            data[shot] = (wave[:, np.newaxis] + noise).astype(dtype)
+    return path
+
+
+@pytest.fixture(scope='session')
+def datadir(tmp_path_factory):
+    return tmp_path_factory.mktemp('dataview_bench')
+
+
+@pytest.fixture(scope='session', params=list(FILE_CASES))
+def datafile(request, datadir):
+    """Path to a synthetic file for each of FILE_CASES."""
+    shape, chunks, compression = FILE_CASES[request.param]
+    path = os.path.join(str(datadir), request.param + '.hdf5')
+    if not os.path.isfile(path):
+        make_file(path, shape, chunks=chunks, compression=compression)
+    return path
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    from PyQt5 import QtWidgets
+    app = QtWidgets.QApplication.instance()
+    if app is None:
+        app = QtWidgets.QApplication(sys.argv)
+    return app
+
+
+@pytest.fixture
+def window(qapp):
+    """An ApplicationWindow that plots synchronously, at full resolution
+    and without reading ahead, so each call does the same work."""
+    import dataview
+    w = dataview.ApplicationWindow()
+    w.async_load = False
+    w.prefetch_depth = 0
+    w.lodAct.setChecked(False)
+    yield w
+    w.close()
+    qapp.processEvents()
+
+
+@pytest.fixture
+def loaded_window(window, datafile):
+    window.loadFile(datafile)
+    window.redraw.flush()
+    return window
@@ -2,6 +2,20 @@ import sys
 import os
 from pathlib import Path as pathlibPath
 import traceback
+import threading
+import itertools
+import hashlib
+import json
+import argparse
+import glob
+import concurrent.futures
+import multiprocessing
+import subprocess
+import shutil
+import tempfile
+import contextlib
+import tracemalloc
+from collections import OrderedDict, deque
 
 #Used for sci notation spinbox
 import re
@@ -10,16 +24,18 @@ import h5py
 
 import numpy as np
 
-from astropy import units
-
-from scipy import ndimage
+#astropy.units and scipy.ndimage are slow to import, so they are imported
+#where they are first used (UnitConverter.unit, PostProcessor.process) 
+#rather than holding up the window
 
 from PyQt5 import QtWidgets, QtGui, QtCore
 
 import matplotlib
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import matplotlib.figure
-import matplotlib.cm
+import matplotlib.ticker
 
 import time
 
@@ -50,11 +66,60 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         #hdf5 filepath
         self.filepath = ''
         
+        #Open handle on the currently loaded hdf5 file (see H5Session)
+        self.session = None
+        
+        #Recently read data slices, so redraws that don't change the slice
+        #don't have to go back to the file
+        self.slice_cache = SliceCache()
+        #Bytes the slice cache and the hdf5 chunk cache may use between them
+        self.cache_budget = SLICE_CACHE_BYTES
+        
+        #Timings of recent runs of the plot pipeline, recorded while the
+        #performance box is shown. profile is the run in progress.
+        self.profiler = Profiler(self.slice_cache)
+        self.profile = None
+        self.request_profile = None
+        
+        #Reading and filtering data is done on a worker thread so the GUI
+        #doesn't freeze. Only one runs at a time, and only the result of the
+        #most recent request (request_id) gets plotted.
+        self.async_load = True
+        self.data_pool = QtCore.QThreadPool()
+        self.data_pool.setMaxThreadCount(1)
+        self.request_id = 0
+        self.request_spec = None
+        self.loading = False
+        
+        #Estimate of the work done by the last read (see plan_read)
+        self.read_plan = None
+        
+        #Averages are accumulated a block at a time, reading at most this
+        #many bytes from the file at once
+        self.avg_block_bytes = AVG_BLOCK_BYTES
+        
+        #When stepping along a fixed axis (arrow keys, movies), the next
+        #prefetch_depth slices in the same direction are read ahead into 
+        #the slice cache on a separate low priority thread, using at most
+        #prefetch_max_bytes of the cache
+        self.prefetch_depth = PREFETCH_DEPTH
+        self.prefetch_max_bytes = PREFETCH_BYTES
+        self.prefetch_pool = QtCore.QThreadPool()
+        self.prefetch_pool.setMaxThreadCount(1)
+        self.prefetch_id = 0
+        self.prefetch_last_spec = None
+        
         #plot save filepath
         self.plotsave_dir = ''
         
         #Directory for movie frames to be saved
         self.movie_dir = ''
+        
+        #Movies are exported by rendering frames in this many worker 
+        #processes (see exportMovie). movie_export holds the state of an
+        #export while it runs.
+        self.movie_workers = os.cpu_count() or 1
+        self.movie_export = None
     
         #Array of axes dictionaries
         self.axes = []
@@ -92,10 +157,34 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         
         
         #Plotting variables
+        #raw_data is the slice as read from the file, data is raw_data after
+        #unit scaling and any filtering has been applied (by post, into 
+        #buffers that are reused from plot to plot)
+        self.raw_data = None
+        self.post = PostProcessor()
+        #(min, max) of data, in double precision whatever the dtype of data
+        self.data_extent = (0.0, 0.0)
         self.data = 0
-        self.hax = {'ax': 0, 'name': '', 'slice': 0, 'unit': '', 'unit_factor': 0}
+        self.hax = {'ax': 0, 'name': '', 'slice': 0, 'unit': '', 'unit_factor': 0,
+                    'monotonic': 0}
         self.vax = {'ax': 0, 'name': '', 'slice': 0, 'unit': '', 'unit_factor': 0}
         
+        #Get astropy's unit parser ready in the background once the window
+        #is up, so neither the window nor the first unit edit waits for it
+        QtCore.QTimer.singleShot(UNIT_WARMUP_DELAY, UNIT_CONVERTER.warmUp)
+        
+        #Plotting is split into stages, each of which only needs to be rerun
+        #if it, or a stage before it, is dirty:
+        #data (read from file) -> filter (units and filters) -> 
+        #render (draw the plot) -> range
+        self.stages = ['data', 'filter', 'render', 'range']
+        self.dirty = {stage:True for stage in self.stages}
+        
+        #Widgets request the pipeline to be run through redraw, so that one 
+        #user action firing several signals (e.g. both buttons of a radio 
+        #group toggling) only runs it once, with every stage marked dirty
+        self.redraw = RedrawScheduler(self.runPipeline)
+        
         
         #DEFINE fonts
         self.text_font = QtGui.QFont()
@@ -125,6 +214,9 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         savePlotAct = QtWidgets.QAction(" &Save Plot", self)
         savePlotAct.triggered.connect(self.savePlot)
         
+        saveConfigAct = QtWidgets.QAction(" Save &Config", self)
+        saveConfigAct.triggered.connect(self.saveConfig)
+        
         #Setup options menue + actions within
         optionsMenu = QtWidgets.QMenu('Options', self)
         
@@ -137,6 +229,23 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.showMovieBox.setChecked(False)
         self.showMovieBox.triggered.connect(self.showMovieBoxAction)
         
+        self.lodAct = QtWidgets.QAction(" &Level of Detail", self, checkable=True)
+        self.lodAct.setChecked(True)
+        self.lodAct.triggered.connect(self.updateReadAction)
+        
+        #Float32 mode keeps scaled/filtered data in single precision, which
+        #halves the memory used by big slices
+        self.float32Act = QtWidgets.QAction(" Float&32 Mode", self, checkable=True)
+        self.float32Act.setChecked(False)
+        self.float32Act.triggered.connect(self.updateReadAction)
+        
+        self.showPerfBox = QtWidgets.QAction(" &Performance", self, checkable=True)
+        self.showPerfBox.setChecked(False)
+        self.showPerfBox.triggered.connect(self.showPerfBoxAction)
+        
+        self.buildSidecarAct = QtWidgets.QAction(" &Build Overview", self)
+        self.buildSidecarAct.triggered.connect(self.buildSidecarAction)
+        
         
         
         
@@ -149,11 +258,16 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         menubar.addAction(quitAct)
         menubar.addAction(loadAct)
         menubar.addAction(savePlotAct)
+        menubar.addAction(saveConfigAct)
         
         #Add options menu and associated submenu options
         menubar.addMenu(optionsMenu)
         optionsMenu.addAction(self.showFilter)
         optionsMenu.addAction(self.showMovieBox)
+        optionsMenu.addAction(self.lodAct)
+        optionsMenu.addAction(self.float32Act)
+        optionsMenu.addAction(self.showPerfBox)
+        optionsMenu.addAction(self.buildSidecarAct)
         
 
         self.centerbox = QtWidgets.QVBoxLayout()
@@ -193,12 +307,12 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.plot_title_checkbox = QtWidgets.QCheckBox("Auto plot title?")
         self.plot_title_checkbox.setChecked(True)  
         self.plottype_box.addWidget(self.plot_title_checkbox)
-        self.plot_title_checkbox.stateChanged.connect(self.makePlot)
+        self.plot_title_checkbox.stateChanged.connect(self.redrawPlotAction)
         self.connectedList.append(self.plot_title_checkbox)
         
         self.plot_title = QtWidgets.QLineEdit("Custom title text")
         self.plottype_box.addWidget(self.plot_title)
-        self.plot_title.editingFinished.connect(self.makePlot)
+        self.plot_title.editingFinished.connect(self.redrawPlotAction)
         self.connectedList.append(self.plot_title)
         
         self.fig_2d_props_box = QtWidgets.QHBoxLayout()
@@ -210,7 +324,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.plotImageBtn = QtWidgets.QRadioButton("ImagePlot")
         self.plotImageBtn.setChecked(True)
         self.fig_2d_props_box.addWidget(self.plotImageBtn)
-        self.plotImageBtn.toggled.connect(self.makePlot)
+        self.plotImageBtn.toggled.connect(self.redrawPlotAction)
         
         self.plotContourBtn = QtWidgets.QRadioButton("ContourPlot")
         self.fig_2d_props_box.addWidget(self.plotContourBtn)
@@ -221,7 +335,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         
         self.aspect_ratio_check = QtWidgets.QCheckBox("Fix Aspect Ratio?")
         self.aspect_ratio_check.setChecked(False)  
-        self.aspect_ratio_check.toggled.connect(self.makePlot)
+        self.aspect_ratio_check.toggled.connect(self.redrawPlotAction)
         self.plot_opts_box.addWidget(self.aspect_ratio_check)
         
         
@@ -232,7 +346,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.fig_2d_props_box.addWidget(self.colormap_field)
         for k in self.colormap_dict.keys():
             self.colormap_field.addItem(k)
-        self.colormap_field.currentIndexChanged.connect(self.makePlot)
+        self.colormap_field.currentIndexChanged.connect(self.redrawPlotAction)
         self.connectedList.append(self.colormap_field)
 
         #This label shows warnings to explain why plots weren't made
@@ -243,8 +357,45 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.figure = matplotlib.figure.Figure(figsize=(5, 3))
         self.canvas = FigureCanvas(self.figure)
         self.canvas.setMinimumSize(500, 500)
+        self.toolbar = NavigationToolbar(self.canvas, self)
+        self.centerbox.addWidget(self.toolbar)
         self.centerbox.addWidget(self.canvas)
         
+        #Reports how much of the data is actually being drawn
+        self.pointslabel = QtWidgets.QLabel('')
+        self.centerbox.addWidget(self.pointslabel)
+        self.line_range = None
+        
+        #Level of detail: 2D plots are read at (about) the resolution of the
+        #screen. lod_view holds the index range of each plotted axis that is
+        #zoomed into (None if not zoomed), and view_limits the axes limits to
+        #keep while zoomed. When the zoom settles, lod_timer checks whether
+        #finer data needs to be read.
+        self.lod_view = None
+        self.view_limits = None
+        self.loaded_spec = None
+        self.lod_timer = QtCore.QTimer()
+        self.lod_timer.setSingleShot(True)
+        self.lod_timer.setInterval(200)
+        self.lod_timer.timeout.connect(self.checkLevelOfDetail)
+        
+        #The axes, line/image and colorbar currently on the canvas are kept
+        #and updated in place as long as the kind of plot doesn't change.
+        #canvas_layout is '1D', '2D' (image), 'contour' or None (empty)
+        self.canvas_layout = None
+        self.canvas_ax = None
+        self.canvas_line = None
+        self.canvas_image = None
+        self.canvas_cbar = None
+        self.canvas_cbformat = None
+        
+        #The line/image and title are animated, so when nothing else on the
+        #canvas changes they can be blitted over this saved background
+        #instead of redrawing the whole figure
+        self.blit_background = None
+        self.blit_state = None
+        self.canvas.mpl_connect('draw_event', self.onCanvasDraw)
+        
         
         #Create the datarange box
         self.datarange_box = QtWidgets.QHBoxLayout()
@@ -301,19 +452,19 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.nofilter_checkbox.setChecked(False)  
         self.filterbox.addWidget(self.nofilter_checkbox)
         self.filterbox_widgets.append(self.nofilter_checkbox)
-        self.nofilter_checkbox.toggled.connect(self.makePlot)
+        self.nofilter_checkbox.toggled.connect(self.updateFilterAction)
         
         self.lowpass_checkbox = QtWidgets.QRadioButton("Lowpass")
         self.lowpass_checkbox.setChecked(False)  
         self.filterbox.addWidget(self.lowpass_checkbox)
         self.filterbox_widgets.append(self.lowpass_checkbox)
-        self.lowpass_checkbox.toggled.connect(self.makePlot)
+        self.lowpass_checkbox.toggled.connect(self.updateFilterAction)
         
         self.highpass_checkbox = QtWidgets.QRadioButton("Highpass")
         self.highpass_checkbox.setChecked(False)  
         self.filterbox.addWidget(self.highpass_checkbox)
         self.filterbox_widgets.append(self.highpass_checkbox)
-        self.highpass_checkbox.toggled.connect(self.makePlot)
+        self.highpass_checkbox.toggled.connect(self.updateFilterAction)
         
 
         self.filter_sigma_lbl = QtWidgets.QLabel("Filter Sigma: ")
@@ -329,7 +480,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.filter_sigma.setWrapping(False)
         self.filterbox.addWidget(self.filter_sigma)
         self.filterbox_widgets.append(self.filter_sigma)
-        self.filter_sigma.editingFinished.connect(self.makePlot)
+        self.filter_sigma.editingFinished.connect(self.updateFilterAction)
         for x in self.filterbox_widgets:
             x.hide()
             
@@ -408,6 +559,34 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.movie_range_box.addWidget(self.movie_num)
         self.moviebox_widgets.append(self.movie_num)
         
+        #Movie output format for Export: separate PNG frames, or a single 
+        #movie file at the chosen frame rate (and codec, for ffmpeg)
+        self.movie_format_box = QtWidgets.QHBoxLayout()
+        self.moviebox.addLayout(self.movie_format_box)
+        
+        self.movie_format_lbl = QtWidgets.QLabel("Format, FPS, Codec:")
+        self.movie_format_box.addWidget(self.movie_format_lbl)
+        self.moviebox_widgets.append(self.movie_format_lbl)
+        
+        self.movie_format = QtWidgets.QComboBox()
+        for k in MOVIE_FORMATS.keys():
+            self.movie_format.addItem(k)
+        self.movie_format.currentIndexChanged.connect(self.updateMovieFormatAction)
+        self.movie_format_box.addWidget(self.movie_format)
+        self.moviebox_widgets.append(self.movie_format)
+        
+        self.movie_fps = QtWidgets.QSpinBox()
+        self.movie_fps.setRange(1, 120)
+        self.movie_fps.setValue(10)
+        self.movie_fps.setFixedWidth(width)
+        self.movie_format_box.addWidget(self.movie_fps)
+        self.moviebox_widgets.append(self.movie_fps)
+        
+        self.movie_codec = QtWidgets.QComboBox()
+        self.movie_format_box.addWidget(self.movie_codec)
+        self.moviebox_widgets.append(self.movie_codec)
+        self.updateMovieFormatAction()
+        
         #Control Buttons
         self.movie_ctl_box = QtWidgets.QHBoxLayout()
         self.moviebox.addLayout(self.movie_ctl_box)
@@ -418,12 +597,73 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.movie_ctl_box.addWidget(self.movie_run_button)
         self.moviebox_widgets.append(self.movie_run_button)
         
+        self.movie_export_button = QtWidgets.QPushButton("Export")
+        self.movie_export_button.clicked.connect(self.exportMovie)
+        self.movie_ctl_box.addWidget(self.movie_export_button)
+        self.moviebox_widgets.append(self.movie_export_button)
+        
 
         #editingFinished.connect(self.updateAxesFieldsAction)
         
         
         for x in self.moviebox_widgets:
             x.hide()
+            
+            
+        #CREATE AND FILL THE PERFORMANCE BOX
+        #Timings of each stage of the selected run of the plot pipeline
+        #(the most recent by default), and a list of the recent runs
+        self.perfbox = QtWidgets.QVBoxLayout()
+        self.rightbox.addLayout(self.perfbox)
+        self.perfbox_widgets = []
+        
+        self.perf_div = QtWidgets.QFrame()
+        self.perf_div.setFrameShape(QtWidgets.QFrame.HLine)
+        self.perf_div.setLineWidth(3)
+        self.perfbox.addWidget(self.perf_div)
+        self.perfbox_widgets.append(self.perf_div)
+        
+        self.perf_box_lbl = QtWidgets.QLabel("Performance")
+        self.perf_box_lbl.setFont(self.title_font)
+        self.perf_box_lbl.setAlignment(QtCore.Qt.AlignCenter)
+        self.perfbox.addWidget(self.perf_box_lbl)
+        self.perfbox_widgets.append(self.perf_box_lbl)
+        
+        self.perf_table = QtWidgets.QTableWidget(len(PROFILE_STAGES), 3)
+        self.perf_table.setHorizontalHeaderLabels(['Time', 'Read', 'Cache Hits'])
+        self.perf_table.setVerticalHeaderLabels(PROFILE_STAGES)
+        self.perf_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.perf_table.horizontalHeader().setSectionResizeMode(
+                QtWidgets.QHeaderView.Stretch)
+        self.perfbox.addWidget(self.perf_table)
+        self.perfbox_widgets.append(self.perf_table)
+        
+        self.perf_summary = QtWidgets.QLabel('')
+        self.perf_summary.setWordWrap(True)
+        self.perfbox.addWidget(self.perf_summary)
+        self.perfbox_widgets.append(self.perf_summary)
+        
+        self.perf_history = QtWidgets.QListWidget()
+        self.perf_history.setMaximumHeight(120)
+        self.perf_history.currentRowChanged.connect(self.showProfile)
+        self.perfbox.addWidget(self.perf_history)
+        self.perfbox_widgets.append(self.perf_history)
+        
+        self.perf_ctl_box = QtWidgets.QHBoxLayout()
+        self.perfbox.addLayout(self.perf_ctl_box)
+        
+        self.perf_export_button = QtWidgets.QPushButton("Export Trace")
+        self.perf_export_button.clicked.connect(self.exportTrace)
+        self.perf_ctl_box.addWidget(self.perf_export_button)
+        self.perfbox_widgets.append(self.perf_export_button)
+        
+        self.perf_clear_button = QtWidgets.QPushButton("Clear")
+        self.perf_clear_button.clicked.connect(self.clearProfiles)
+        self.perf_ctl_box.addWidget(self.perf_clear_button)
+        self.perfbox_widgets.append(self.perf_clear_button)
+        
+        for x in self.perfbox_widgets:
+            x.hide()
 
 
 
@@ -488,48 +728,122 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         
         if not userinput.is_file():
              print("Invalid input (ignoring): " + str(userinput) )
-                
         else:
-             print("Loading file: " + str(userinput) )
-             self.filepath = userinput
+             self.loadFile(userinput)
              
-             #Saving old settings and resetting arrays to default
-             self.last_axes = self.axes #Copy over any axes to memory
-             self.axes = []
-             self.last_cur_axes = self.cur_axes
-             self.cur_axes = [0,0]
              
-             with h5py.File(self.filepath, 'r') as f:
-                  temp_axes = ( f['data'].attrs['dimensions']  ) 
-                  
-                  self.data_unit_field.setText( f['data'].attrs['unit'])
-                  self.data_native_unit = self.data_unit_field.text()
-                  self.data_cur_unit = self.data_native_unit
-
-                  
-                  for ind, axis in enumerate(temp_axes):
-                     ax = {}
-                     name = axis.decode("utf-8")
-                     ax['name'] =  name
-                     ax['ax'] = f[name][:]
-                     ax['axind'] = ind
-                     ax['native_unit'] = f[name].attrs['unit']
-                     
-                     
-                     ax['indminmax'] = ( 0 ,  len(f[name]) -1 )
-                     ax['valminmax'] = ( f[name][0] , f[name][-1] )
-                     
-                     try:
-                         ax['step'] = np.mean(np.gradient(ax['ax']))
-                     except ValueError:
-                         ax['step'] = 1
-                         
-                     self.axes.append(ax)
-                    
-             self.freezeGUI()
-             self.initAxesBoxes()
-             self.unfreezeGUI()
-             self.makePlot()
+    def loadFile(self, filepath):
+         print("Loading file: " + str(filepath) )
+         
+         #Close the handle on any previously loaded file before opening the
+         #new one
+         if self.session is not None:
+              #Don't close the file out from under a running read
+              self.request_id += 1
+              self.prefetch_id += 1
+              self.data_pool.clear()
+              self.prefetch_pool.clear()
+              self.data_pool.waitForDone()
+              self.prefetch_pool.waitForDone()
+              self.prefetch_last_spec = None
+              self.session.close()
+         self.session = H5Session(filepath)
+         self.slice_cache.clear()
+         self.updateCacheBudget()
+         if self.session.sidecar_stale:
+              print("Overview file " + sidecar_path(filepath) + " is out of " +
+                    "date and will be ignored until it is rebuilt")
+         self.filepath = filepath
+         
+         self.data_unit_field.setText( self.session.data.attrs['unit'])
+         self.data_native_unit = self.data_unit_field.text()
+         self.data_cur_unit = self.data_native_unit
+         
+         self.loadAxes()
+         self.makePlot()
+         
+         
+    def loadAxes(self):
+         #(Re)read the axes of the open file and rebuild their boxes, keeping
+         #the settings of any axes with the same names as before
+         if self.debug:
+              print("Loading axes")
+         
+         #Saving old settings and resetting arrays to default
+         self.last_axes = self.axes #Copy over any axes to memory
+         self.axes = []
+         self.last_cur_axes = self.cur_axes
+         self.cur_axes = [0,0]
+         
+         temp_axes = ( self.session.data.attrs['dimensions']  ) 
+         
+         for ind, axis in enumerate(temp_axes):
+            ax = {}
+            name = axis.decode("utf-8")
+            ax['name'] =  name
+            #The axis array is only read when it is needed (see LazyAxis)
+            ax['ax'] = self.session.axis(name)
+            ax['axind'] = ind
+            ax['native_unit'] = ax['ax'].unit
+            
+            
+            ax['indminmax'] = ( 0 ,  len(ax['ax']) -1 )
+            ax['valminmax'] = ( ax['ax'].first , ax['ax'].last )
+            ax['step'] = ax['ax'].step
+                
+            self.axes.append(ax)
+               
+         self.freezeGUI()
+         self.initAxesBoxes()
+         self.unfreezeGUI()
+         
+         
+    def buildSidecarAction(self):
+         if self.debug:
+              print("Building overview sidecar")
+         if self.session is None:
+              return
+         
+         progress = QtWidgets.QProgressDialog("Building overview of " + 
+                                              os.path.basename(self.filepath),
+                                              "Cancel", 0, 100, self)
+         progress.setWindowModality(QtCore.Qt.WindowModal)
+         progress.setMinimumDuration(0)
+         
+         def update(fraction):
+              progress.setValue(int(100*fraction))
+              QtWidgets.QApplication.processEvents()
+              return not progress.wasCanceled()
+         
+         try:
+              path = build_sidecar(self.filepath, progress=update)
+         except (OSError, ValueError) as e:
+              self.warninglabel.setText("WARNING: Building overview failed: " + str(e))
+              path = None
+         progress.close()
+         
+         if path is not None:
+              #Reads may now be answered from the overview instead
+              self.session.loadSidecar()
+              self.slice_cache.clear()
+              self.makePlot()
+              
+              
+    def closeEvent(self, event):
+         #Stop any movie export (waiting for the frames already being 
+         #rendered) so no workers or movie writer are left running
+         self.cancelMovieExport(wait=True)
+         #Let any running read finish, then release the file handle
+         self.redraw.cancel()
+         self.request_id += 1
+         self.prefetch_id += 1
+         self.data_pool.clear()
+         self.prefetch_pool.clear()
+         self.data_pool.waitForDone()
+         self.prefetch_pool.waitForDone()
+         if self.session is not None:
+              self.session.close()
+         super().closeEvent(event)
 
 
     def initAxesBoxes(self):
@@ -548,6 +862,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         #Remove old items from dropdown menus
         self.dropdown1.clear()
         self.dropdown2.clear()
+        self.movie_ax.clear()
 
         for i, ax in enumerate(self.axes):
             #Take the ax out of the axes array
@@ -828,6 +1143,94 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         else:
             for x in self.moviebox_widgets:
                 x.hide()
+                
+    def showPerfBoxAction(self):
+        #Profiling (and tracemalloc) only runs while the box is shown
+        self.profiler.setEnabled(self.showPerfBox.isChecked())
+        if self.showPerfBox.isChecked():
+            for x in self.perfbox_widgets:
+                x.show()
+            self.updatePerfBox()
+        else:
+            for x in self.perfbox_widgets:
+                x.hide()
+                
+    def updatePerfBox(self):
+        #Refill the list of recent runs (newest first) and show the newest
+        if not self.showPerfBox.isChecked():
+            return
+        self.perf_history.blockSignals(True)
+        self.perf_history.clear()
+        for profile in reversed(self.profiler.history):
+            stages = ', '.join(name + ' ' + '%.1f' % t['ms'] 
+                               for name, t in profile.totals().items())
+            self.perf_history.addItem('#' + str(profile.plot_id) + ' ' + 
+                                      profile.label + ': ' + 
+                                      '%.1f ms' % profile.duration() + 
+                                      ' (' + stages + ')')
+        self.perf_history.blockSignals(False)
+        self.perf_history.setCurrentRow(0)
+        self.showProfile(0)
+        
+    def showProfile(self, row):
+        #Show the stages of the row'th most recent run in the table
+        history = list(self.profiler.history)
+        self.perf_table.clearContents()
+        if row < 0 or row >= len(history):
+            self.perf_summary.setText('')
+            return
+        profile = history[-1 - row]
+        totals = profile.totals()
+        for i, name in enumerate(PROFILE_STAGES):
+            if name not in totals:
+                continue
+            t = totals[name]
+            lookups = t['cache_hits'] + t['cache_misses']
+            cells = ['%.1f ms' % t['ms'], 
+                     format_bytes(t['bytes_read']),
+                     '%d%%' % (100*t['cache_hits']/lookups) if lookups > 0 else '-']
+            for j, text in enumerate(cells):
+                self.perf_table.setItem(i, j, QtWidgets.QTableWidgetItem(text))
+                
+        summary = "Total: " + '%.1f ms' % profile.duration()
+        if profile.peak_memory is not None:
+            #tracemalloc's peak is for the whole process, not one stage
+            summary += "   Peak memory (all threads): " + format_bytes(profile.peak_memory)
+        read = [t for name, t in totals.items() if name in ('read', 'average')]
+        #Only if the slice was read from the file, rather than the cache
+        if (profile.read_plan is not None and 
+                any(t['cache_misses'] > 0 for t in read)):
+            summary += ("   Read amplification: " + 
+                        '%.1fx' % profile.read_plan['amplification'] + " (" + 
+                        str(profile.read_plan['nchunks']) + " chunks, " + 
+                        format_bytes(profile.read_plan['bytes_touched']) + " touched)")
+        if profile.cache is not None:
+            summary += ("   Slice cache: " + '%d%%' % (100*profile.cache['hit_rate']) + 
+                        " hits, " + format_bytes(profile.cache['nbytes']) + " of " + 
+                        format_bytes(profile.cache['max_bytes']))
+        if profile.units is not None:
+            summary += "   Unit cache: " + '%d%%' % (100*profile.units['hit_rate']) + " hits"
+        if profile.redraw is not None:
+            summary += ("   Redraws: " + str(profile.redraw['suppressed']) + " of " + 
+                        str(profile.redraw['requests']) + " requests suppressed")
+        self.perf_summary.setText(summary)
+        
+    def exportTrace(self):
+        if self.debug:
+            print("Exporting profile trace")
+        savedialog = QtWidgets.QFileDialog()
+        if self.plotsave_dir == '':
+             self.plotsave_dir = os.path.dirname(self.filepath)
+        suggested_name = os.path.join(self.plotsave_dir, 'dataview_trace.json')
+        savefile = savedialog.getSaveFileName(self, "Save trace as: ", 
+                                              suggested_name, "JSON (*.json)")[0]
+        if savefile == '':
+            return
+        self.profiler.saveTrace(savefile)
+        
+    def clearProfiles(self):
+        self.profiler.clear()
+        self.updatePerfBox()
                     
     def updateAxesFieldsAction(self):
         if self.debug:
@@ -860,11 +1263,12 @@ class ApplicationWindow(QtWidgets.QMainWindow):
              print("Updating data units")
          try:
               #Update the data units first
-              u = units.Unit(self.data_unit_field.text(), parse_strict='raise', format='ogip')
-              cu = units.Unit(self.data_cur_unit , parse_strict='raise', format='ogip')
-              nu = units.Unit(self.data_native_unit, parse_strict='raise', format='ogip')
-              self.data_unit_factor =  ( (1 * nu).to(u) ).value 
-              cur_unit_factor = ( (1 * nu).to(cu) ).value
+              self.data_unit_factor = UNIT_CONVERTER.factor(self.data_native_unit,
+                                                            self.data_unit_field.text())
+              cur_unit_factor = UNIT_CONVERTER.factor(self.data_native_unit,
+                                                      self.data_cur_unit)
+              if self.debug:
+                   print("Unit cache: " + str(UNIT_CONVERTER.stats()))
               
               datarange_a_val = float(self.datarange_a.text())
               datarange_b_val = float(self.datarange_b.text())
@@ -874,7 +1278,10 @@ class ApplicationWindow(QtWidgets.QMainWindow):
               
               self.data_cur_unit = self.data_unit_field.text()
               
-              self.makePlot()
+              #The units are applied with the filters (and the rescaled 
+              #range after them), so the data doesn't need to be read again
+              self.markDirty('filter')
+              self.redraw.request()
          except ValueError:
               self.warninglabel.setText("WARNING: Unit string is invalid: " + str(self.data_unit_field.text()) )
   
@@ -892,14 +1299,12 @@ class ApplicationWindow(QtWidgets.QMainWindow):
                             print("Axis Native Unit: " + str(ax['native_unit']))
                             print("Axis Unit Factor: " + str(ax['unit_factor']))
                         
-                       u = units.Unit(ax['unit_field'].text(), parse_strict='raise', format='ogip')
-                       cu = units.Unit(ax['disp_unit'], parse_strict='raise', format='ogip')
-                       nu = units.Unit(ax['native_unit'], parse_strict='raise', format='ogip')
-         
                        #New unit factor in relation to the native units
-                       new_uf =  (1 * nu).to(u).value
+                       new_uf = UNIT_CONVERTER.factor(ax['native_unit'], 
+                                                      ax['unit_field'].text())
                        #Old (currently displayed) unit factor in relation to native units
-                       old_uf =  (1 * nu).to(cu).value
+                       old_uf = UNIT_CONVERTER.factor(ax['native_unit'], 
+                                                      ax['disp_unit'])
                        
                        #Temporarily store the values so they don't get messed up
                        #by the changing of the range
@@ -946,7 +1351,8 @@ class ApplicationWindow(QtWidgets.QMainWindow):
               self.datarange_a.setValue(- self.datarange_b.value() )
          else:
               self.datarange_a.setDisabled(False)
-         self.makePlot()
+         self.markDirty('range')
+         self.redraw.request()
               
         
 
@@ -999,46 +1405,290 @@ class ApplicationWindow(QtWidgets.QMainWindow):
        self.warninglabel.setText("")
        return True
 
-    def makePlot(self):
+    def makePlot(self, blocking=False):
         if self.debug:
              print("Making plot")
-        self.clearCanvas()
+        #Anything that calls makePlot may have changed which data is plotted,
+        #so every stage needs to be redone
+        self.markDirty('data')
+        
+        #...and the plot goes back to showing the full range selected
+        self.lod_view = None
+        self.view_limits = None
+        self.toolbar.update()
+        
+        if blocking:
+            #Any run already scheduled is done by this one
+            self.redraw.cancel()
+            self.runPipeline(blocking=True)
+        else:
+            self.redraw.request()
+        
+        
+    def redrawPlotAction(self):
+        if self.debug:
+             print("Triggered redrawPlotAction")
+        #Cosmetic changes (title, colormap, aspect ratio...) only need the
+        #plot to be redrawn from the data already in memory
+        self.markDirty('render')
+        self.redraw.request()
+        
+        
+    def updateFilterAction(self):
+        if self.debug:
+             print("Triggered updateFilterAction")
+        self.markDirty('filter')
+        self.redraw.request()
+        
+        
+    def updateReadAction(self):
+        if self.debug:
+             print("Triggered updateReadAction")
+        #Options that change how the data is read (level of detail, float32)
+        #need it read again, but keep the current view
+        self.markDirty('data')
+        self.redraw.request()
+        
+        
+    def markDirty(self, stage):
+        #Mark a stage, and every stage after it, as needing to be rerun
+        for s in self.stages[self.stages.index(stage):]:
+            self.dirty[s] = True
+        #A request still being read or filtered for the old settings is now
+        #stale, even though the new one won't be made until the scheduled 
+        #redraw runs
+        if self.dirty['filter']:
+            self.request_id += 1
+            
+            
+    def runPipeline(self, blocking=False, resume=False):
+        if self.debug:
+             print("Running plot pipeline: " + str(self.dirty) + ", redraws " +
+                   str(self.redraw.stats()))
+        
+        #If there is no data in memory yet, everything has to be redone
+        if self.raw_data is None:
+            self.markDirty('data')
+            
+        #Each run is profiled from its first dirty stage, except when it is
+        #resumed (once the worker's data is back)
+        if not resume:
+            first = [s for s in self.stages if self.dirty[s]]
+            self.profile = self.profiler.begin(first[0] if len(first) > 0 else 'none')
+        
         try:
-            if self.validateChoices():
-                self.getData()
+            if self.dirty['data']:
+                with profile_stage(self.profile, 'validate'):
+                    valid = self.validateChoices()
+                    
+                    #Reopen the file first if it has changed on disk (but 
+                    #don't close it out from under a read that is still 
+                    #running). Its axes may have been rewritten or grown,
+                    #so they are read again too.
+                    if valid and self.session.changed():
+                        self.prefetch_id += 1
+                        self.data_pool.clear()
+                        self.prefetch_pool.clear()
+                        self.data_pool.waitForDone()
+                        self.prefetch_pool.waitForDone()
+                        self.prefetch_last_spec = None
+                        self.session.refresh()
+                        self.slice_cache.clear()
+                        self.updateCacheBudget()
+                        self.loadAxes()
+                        self.lod_view = None
+                        self.view_limits = None
+                        valid = self.validateChoices()
+                        
+                if not valid:
+                    #Make sure any outstanding request doesn't get plotted
+                    self.request_id += 1
+                    self.loading = False
+                    self.clearCanvas()
+                    return
                 
+            #Reading and filtering is done by a worker thread unless the
+            #caller needs the plot to be finished when this returns. The rest 
+            #of the pipeline is run when the worker's result comes back.
+            if self.dirty['data'] or self.dirty['filter']:
+                if self.async_load and not blocking:
+                    self.requestData(read=self.dirty['data'])
+                    return
+                
+                #Anything still running in the background is now stale
+                self.request_id += 1
+                self.loading = False
+                if self.dirty['data']:
+                    self.getData()
+                    self.dirty['data'] = False
                 self.applyDataFunctions()
+                self.dirty['filter'] = False
+                
+            #While new data is being loaded, wait for it instead of redrawing
+            #the old data
+            if self.loading:
+                return
+                
+            if self.dirty['render']:
+                with profile_stage(self.profile, 'draw'):
+                    if self.plottype_field.currentIndex() == 0:
+                        self.plot1D()
+                    elif self.plottype_field.currentIndex() == 1:
+                        self.plot2D()
+                self.dirty['render'] = False
+                self.dirty['range'] = False
+            
+            elif self.dirty['range']:
+                with profile_stage(self.profile, 'draw'):
+                    self.applyDataRange()
+                self.dirty['range'] = False
                 
-                if self.plottype_field.currentIndex() == 0:
-                    self.plot1D()
-                elif self.plottype_field.currentIndex() == 1:
-                    self.plot2D()
         except ValueError as e:
             print("Value Error!: " + str(e))
             print(traceback.format_exc())
         except IndexError as e:
             print("Index Error!: " + str(e))
             print(traceback.format_exc())
+        finally:
+            #Unless the rest of the run is waiting on the worker
+            if not self.loading and self.profile is not None:
+                self.profile.redraw = self.redraw.stats()
+                self.profiler.finish(self.profile)
+                self.profile = None
+                self.updatePerfBox()
    
     
     def applyDataFunctions(self):
+        if self.debug:
+             print("Applying data functions")
+        #Filters always start from the unfiltered data, so changing the
+        #filter settings (or data units) doesn't require the data to be read
+        #again
         if self.lowpass_checkbox.isChecked():
-            sigma = self.filter_sigma.value()
-            self.data = ndimage.gaussian_filter(self.data, sigma)
+            filter_type = 'lowpass'
         elif self.highpass_checkbox.isChecked():
-            sigma = self.filter_sigma.value()
-            self.data = self.data - ndimage.gaussian_filter(self.data, sigma)
+            filter_type = 'highpass'
+        else:
+            filter_type = None
+        with profile_stage(self.profile, 'filter'):
+            self.data, slot = self.post.process(self.raw_data, self.data_unit_factor,
+                                                filter_type, self.filter_sigma.value(),
+                                                float32=self.float32Act.isChecked(),
+                                                request_id=self.request_id)
+            if slot is not None:
+                self.post.present(slot, self.request_id)
+            self.data_extent = data_extent(self.data)
+            
+            
+    def dataRange(self):
+        #Returns the (min, max) of the data range, either from the data itself
+        #or from the data range fields
+        if self.datarange_auto.isChecked():
+             if self.datarange_center.isChecked():
+                  datamax = self.data_extent[1]
+                  datamin = - datamax
+             else:
+                  datamin, datamax = self.data_extent
+        else:
+            datamin = float(self.datarange_a.text())
+            datamax = float(self.datarange_b.text())
+        return datamin, datamax
+    
+    
+    def applyDataRange(self):
+        if self.debug:
+             print("Applying data range")
+        datamin, datamax = self.dataRange()
+        if self.plottype_field.currentIndex() == 0:
+            self.canvas_ax.set_ylim(datamin, datamax)
+        elif self.plotContourBtn.isChecked():
+            #Contour levels depend on the range, so the plot must be remade
+            self.plot2D()
+            return
+        else:
+            self.canvas_image.set_clim(datamin, datamax)
+        self.drawCanvas()
 
     
-    def clearCanvas(self):
+    def clearCanvas(self, draw=True):
         if self.debug:
              print("Clearing canvas")
-        try:
-            self.figure.clf()
-            self.canvas_ax.clear()
+        self.figure.clf()
+        self.canvas_layout = None
+        self.canvas_ax = None
+        self.canvas_line = None
+        self.canvas_image = None
+        self.canvas_cbar = None
+        self.canvas_cbformat = None
+        self.blit_background = None
+        if draw:
             self.canvas.draw()
-        except AttributeError as e:
-            pass
+            
+            
+    def canvasLayout(self):
+        #The kind of plot the current settings call for
+        if self.plottype_field.currentIndex() == 0:
+            return '1D'
+        elif self.plotContourBtn.isChecked():
+            return 'contour'
+        else:
+            return '2D'
+        
+        
+    def animatedArtists(self):
+        artists = []
+        if self.canvas_line is not None:
+            artists.append(self.canvas_line)
+        if self.canvas_image is not None:
+            artists.append(self.canvas_image)
+        if self.canvas_ax is not None and self.canvas_layout != 'contour':
+            artists.append(self.canvas_ax.title)
+        return artists
+        
+    
+    def blitState(self):
+        #Everything that is drawn into the blit background. If any of this
+        #changes the whole canvas must be redrawn.
+        if self.canvas_ax is None:
+            return None
+        state = [self.canvas_layout, 
+                 self.canvas_ax.get_xlim(), self.canvas_ax.get_ylim(),
+                 self.canvas_ax.get_xlabel(), self.canvas_ax.get_ylabel(),
+                 self.canvas_ax.get_aspect()]
+        if self.canvas_cbar is not None:
+            state += [self.canvas_cbar.mappable.get_clim(),
+                      self.canvas_cbar.mappable.get_cmap().name,
+                      self.canvas_cbformat,
+                      self.canvas_cbar.ax.get_xlabel()]
+        return tuple(state)
+    
+    
+    def onCanvasDraw(self, event):
+        #Called after every full draw of the canvas: save the background 
+        #(which doesn't include the animated artists) then draw the animated 
+        #artists on top of it
+        if self.canvas_ax is None or self.canvas.is_saving():
+            return
+        self.blit_background = self.canvas.copy_from_bbox(self.figure.bbox)
+        for artist in self.animatedArtists():
+            self.figure.draw_artist(artist)
+        self.blit_state = self.blitState()
+        
+    
+    def drawCanvas(self):
+        #If only the animated artists have changed since the last full draw,
+        #just redraw those over the saved background
+        if (self.blit_background is not None and self.canvas.supports_blit
+            and self.blitState() == self.blit_state):
+            if self.debug:
+                 print("Blitting canvas")
+            self.canvas.restore_region(self.blit_background)
+            for artist in self.animatedArtists():
+                self.figure.draw_artist(artist)
+            self.canvas.blit(self.figure.bbox)
+        else:
+            self.canvas.draw()
+            
         
     def clearLayout(self, layout):
         if self.debug:
@@ -1069,13 +1719,18 @@ class ApplicationWindow(QtWidgets.QMainWindow):
                 w.show()
                     
                     
-    def getData(self):
+    def dataSpec(self):
         if self.debug:
-             print("Getting Data From File")
+             print("Building data spec")
+        #Collects everything needed to read (and filter) the data to be
+        #plotted from the GUI, so that the work itself doesn't need to touch
+        #any widgets and can be done off of the GUI thread
         dslice = []
         
+        #Averaged axes, as indices into the squeezed data (avg_axes) and 
+        #into the dimensions of the dataset (avg_dims)
         avg_axes = []
-        
+        avg_dims = []
         
         loaded_axes = 0
         if self.plottype_field.currentIndex() == 0:
@@ -1089,16 +1744,19 @@ class ApplicationWindow(QtWidgets.QMainWindow):
                 if i == hax_ind or i == vax_ind:
                     a = int(ax['ind_a'].value())
                     b = int(ax['ind_b'].value())
-                    dslice.append( slice(a, b, 1) )
+                    step = 1
+                    if self.levelOfDetail():
+                         a, b, step = self.lodSlice(i, a, b, i == hax_ind)
+                    dslice.append( slice(a, b, step) )
                     loaded_axes += 1
                     if i == hax_ind:
                          self.hax['name'] = ax['name']
-                         self.hax['slice'] = slice(a,b, 1)
+                         self.hax['slice'] = slice(a,b, step)
                          self.hax['unit'] = ax['unit_field'].text()
                          self.hax['unit_factor'] = ax['unit_factor']
                     elif i == vax_ind:
                          self.vax['name'] = ax['name']
-                         self.vax['slice'] = slice(a,b, 1)
+                         self.vax['slice'] = slice(a,b, step)
                          self.vax['unit'] = ax['unit_field'].text()
                          self.vax['unit_factor'] = ax['unit_factor']
                 elif ax['avgcheckbox'].isChecked():
@@ -1106,39 +1764,207 @@ class ApplicationWindow(QtWidgets.QMainWindow):
                     b = int(ax['ind_b'].value())
                     dslice.append( slice(a, b+1, 1) )
                     avg_axes.append(loaded_axes)
+                    avg_dims.append(i)
                     loaded_axes += 1
                     
                 else:
                     a = int(ax['ind_a'].value())
                     dslice.append( slice(a, a+1, 1) )
+                    
+        spec = {}
+        spec['generation'] = self.session.generation
+        spec['dslice'] = tuple(dslice)
+        spec['avg_axes'] = tuple(avg_axes)
+        spec['avg_dims'] = tuple(avg_dims)
+        spec['avg_block_bytes'] = self.avg_block_bytes
+        spec['hax'] = {'name':self.hax['name'], 'slice':self.hax['slice'], 
+                       'unit_factor':self.hax['unit_factor'], 'dim':hax_ind}
+        if self.plottype_field.currentIndex() == 1:
+            spec['vax'] = {'name':self.vax['name'], 'slice':self.vax['slice'], 
+                           'unit_factor':self.vax['unit_factor'], 'dim':vax_ind}
+        else:
+            spec['vax'] = None
+        spec['transpose'] = vax_ind > hax_ind and spec['vax'] is not None
+        spec['data_unit_factor'] = self.data_unit_factor
+        spec['float32'] = self.float32Act.isChecked()
+        
+        if self.lowpass_checkbox.isChecked():
+            spec['filter'] = 'lowpass'
+        elif self.highpass_checkbox.isChecked():
+            spec['filter'] = 'highpass'
+        else:
+            spec['filter'] = None
+        spec['sigma'] = self.filter_sigma.value()
+        return spec
+    
+    
+    def getData(self):
+        if self.debug:
+             print("Getting Data From File")
+        spec = self.dataSpec()
+        self.planRead(spec)
+        hax, vax, self.raw_data = read_slice(self.session, spec, self.slice_cache,
+                                             profile=self.profile)
+        self.loaded_spec = spec
+        self.hax['ax'] = hax
+        self.hax['monotonic'] = monotonic_direction(hax)
+        if vax is not None:
+            self.vax['ax'] = vax
+        self.schedulePrefetch(spec)
+        
+        
+    def requestData(self, read=True):
+        if self.debug:
+             print("Requesting data from worker")
+        #Any request still waiting or running is now out of date
+        self.request_id += 1
+        self.data_pool.clear()
+        
+        spec = self.dataSpec()
+        self.request_spec = spec
+        self.request_profile = self.profile
+        if read:
+            self.planRead(spec)
+            raw = None
+        else:
+            raw = (self.hax['ax'], self.vax['ax'] if spec['vax'] is not None else None,
+                   self.raw_data)
             
-        with h5py.File(self.filepath, 'r') as f:
-                self.hax['ax'] = np.squeeze(f[self.hax['name'] ][self.hax['slice']])*self.hax['unit_factor']
-                self.data  = np.squeeze(f['data'][tuple(dslice)])*self.data_unit_factor
-                
-                
-                
-                #If selected, apply averaging
-                if len(avg_axes) != 0:
-                    print(self.data.shape)
-                    print(avg_axes)
-                    self.data = np.mean(self.data, axis=tuple(avg_axes))
-                
-                
-                #If 2D plot, do the vertical axis too
-                if self.plottype_field.currentIndex() == 1:
-                    self.vax['ax'] = np.squeeze(f[self.vax['name'] ][self.vax['slice']])*self.vax['unit_factor']
-                    if vax_ind > hax_ind:
-                        self.data = self.data.transpose()
-                
+        worker = DataWorker(self.request_id, self.session, spec, 
+                            self.slice_cache, self.post, raw=raw,
+                            is_current=self.isCurrentRequest,
+                            profile=self.request_profile)
+        worker.signals.finished.connect(self.onDataReady)
+        worker.signals.failed.connect(self.onDataFailed)
+        self.loading = True
+        self.data_pool.start(worker)
+        
+        
+    def planRead(self, spec):
+        #Work out which chunks of the dataset the read will have to decode,
+        #and make sure the chunk cache can hold all of them so stepping to
+        #a neighbouring slice in the same chunks doesn't decode them again
+        self.read_plan = plan_read(self.session.data, spec['dslice'])
+        if self.session.setChunkCache(self.read_plan['bytes_touched']):
+            self.updateCacheBudget()
+            if self.debug:
+                print("Chunk cache resized to " + str(self.session.chunk_cache_nbytes))
+        if self.profile is not None:
+            self.profile.read_plan = self.read_plan
+        if self.debug:
+            print("Read plan: " + str(self.read_plan['nchunks']) + " chunks, " +
+                  str(self.read_plan['bytes_touched']) + " bytes touched, " + 
+                  '%.1f' % self.read_plan['amplification'] + 
+                  " bytes touched per byte returned")
+        
+        
+    def updateCacheBudget(self):
+        #The chunk cache and the slice cache share one memory budget, so
+        #the slice cache gets whatever the chunk cache isn't using
+        chunk_bytes = 0 if self.session is None else self.session.chunk_cache_nbytes
+        self.slice_cache.setMaxBytes(max(self.cache_budget - chunk_bytes, 0))
+        
+        
+    def isCurrentRequest(self, request_id):
+        #Called from the worker thread: reading an int is atomic, so this
+        #is safe without a lock
+        return request_id == self.request_id
+    
+    
+    def onDataReady(self, request_id, result):
+        if request_id != self.request_id:
+            if self.debug:
+                 print("Dropping stale data request " + str(request_id))
+            return
+        if self.debug:
+             print("Data request " + str(request_id) + " ready")
+        hax, vax, raw_data, data, slot, extent = result
+        if slot is not None and not self.post.present(slot, request_id):
+            if self.debug:
+                 print("Dropping overwritten data request " + str(request_id))
+            return
+        self.loading = False
+        self.raw_data, self.data, self.data_extent = raw_data, data, extent
+        self.loaded_spec = self.request_spec
+        self.hax['ax'] = hax
+        self.hax['monotonic'] = monotonic_direction(hax)
+        if vax is not None:
+            self.vax['ax'] = vax
+        self.dirty['data'] = False
+        self.dirty['filter'] = False
+        self.profile = self.request_profile
+        self.runPipeline(resume=True)
+        
+        #Start reading ahead once the requested slice is on screen
+        if self.request_spec is not None:
+            self.schedulePrefetch(self.request_spec)
+        
+        
+    def schedulePrefetch(self, spec):
+        #If this slice is one step along a fixed axis from the last one,
+        #the next few slices in that direction are read into the slice
+        #cache in the background
+        last = self.prefetch_last_spec
+        self.prefetch_last_spec = spec
+        if last is None or self.prefetch_depth < 1:
+            return
+        
+        specs = prefetch_specs(last, spec, self.session.data.shape,
+                               self.prefetch_depth)
+        if len(specs) == 0:
+            return
+        
+        #Cancel any read-ahead that was going in a different direction
+        self.prefetch_id += 1
+        self.prefetch_pool.clear()
+        if self.debug:
+             print("Prefetching " + str(len(specs)) + " slices")
+        
+        #Don't let read-ahead push more than half the cache out
+        max_bytes = min(self.prefetch_max_bytes, self.slice_cache.max_bytes//2)
+        worker = PrefetchWorker(self.prefetch_id, self.session, specs,
+                                self.slice_cache, max_bytes,
+                                is_current=self.isCurrentPrefetch)
+        self.prefetch_pool.start(worker)
+        
+        
+    def isCurrentPrefetch(self, prefetch_id):
+        return prefetch_id == self.prefetch_id
+        
+        
+    def onDataFailed(self, request_id, message):
+        if request_id != self.request_id:
+            return
+        self.loading = False
+        print(message)
+        
 
     def plot1D(self):
         if self.debug:
              print("Making 1D plot")
 
-        self.canvas_ax = self.canvas.figure.subplots()
-
-        self.canvas_ax.plot(self.hax['ax'], self.data, linestyle='-')
+        if self.canvas_layout != '1D':
+            self.clearCanvas(draw=False)
+            self.canvas_ax = self.canvas.figure.subplots()
+            xdata, ydata = self.lineData(0, self.data.size)
+            self.canvas_line, = self.canvas_ax.plot(xdata, ydata,
+                                                    linestyle='-', animated=True)
+            self.canvas_ax.title.set_animated(True)
+            
+            #Setup axis formats
+            self.canvas_ax.ticklabel_format(axis='x', scilimits=(-3,3) )
+            self.canvas_ax.ticklabel_format(axis='y', scilimits=(-3,3) )
+            self.canvas_layout = '1D'
+            
+            #Zooming in draws the visible part of the line in more detail
+            self.canvas_ax.callbacks.connect('xlim_changed', self.onLimitsChanged)
+        else:
+            #Reuse the existing line, rescaling x to the new data
+            xdata, ydata = self.lineData(0, self.data.size)
+            self.canvas_line.set_data(xdata, ydata)
+            self.canvas_ax.set_autoscalex_on(True)
+            self.canvas_ax.relim()
+            self.canvas_ax.autoscale_view(scaley=False)
         
         self.canvas_ax.set_xlabel(str(self.hax['name']) + ' (' + str(self.hax['unit']) + ')')
         self.canvas_ax.set_ylabel('(' + str(self.data_unit_field.text()) + ')')
@@ -1146,24 +1972,46 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         
         title = self.plotTitle()
         self.canvas_ax.set_title(title)
-
-        #Setup axis formats
-        self.canvas_ax.ticklabel_format(axis='x', scilimits=(-3,3) )
-        self.canvas_ax.ticklabel_format(axis='y', scilimits=(-3,3) )
         
         #Autorange if appropriate
-        if self.datarange_auto.isChecked():
-             if self.datarange_center.isChecked():
-                  datamax = np.max(self.data)
-                  datamin = - datamax
-             else:
-                  datamax = np.max(self.data)
-                  datamin = np.min(self.data)    
-        else:
-            datamin = float(self.datarange_a.text())
-            datamax = float(self.datarange_b.text())
+        datamin, datamax = self.dataRange()
         self.canvas_ax.set_ylim(datamin, datamax)
-        self.canvas.draw()
+        self.drawCanvas()
+        
+        
+    def lineData(self, a, b):
+        #The part of the 1D data between indices a and b that should be
+        #drawn: either every point, or (if there are many more points than
+        #pixels) the min/max envelope of one bin per pixel column
+        self.line_range = (a, b)
+        xdata = self.hax['ax'][a:b]
+        ydata = self.data[a:b]
+        if self.lodAct.isChecked():
+            width, height = self.plotPixels()
+            xdata, ydata = minmax_envelope(xdata, ydata, int(width))
+        self.pointslabel.setText("Showing " + format(ydata.size, ',') + " of " +
+                                 format(self.data.size, ',') + " points")
+        return xdata, ydata
+    
+    
+    def updateLine(self):
+        #Redraw the part of the 1D line that is visible after zooming
+        if self.canvas_line is None or self.data is None:
+            return
+        lim = self.canvas_ax.get_xlim()
+        lo, hi = sorted((nearest_index(self.hax['ax'], lim[0], self.hax['monotonic']),
+                         nearest_index(self.hax['ax'], lim[1], self.hax['monotonic'])))
+        
+        #Include one point past each edge so the line reaches the axes
+        a = max(int(lo) - 1, 0)
+        b = min(int(hi) + 2, self.data.size)
+        if (a, b) == self.line_range:
+            return
+        if self.debug:
+            print("Redrawing line between indices " + str(a) + " and " + str(b))
+        xdata, ydata = self.lineData(a, b)
+        self.canvas_line.set_data(xdata, ydata)
+        self.drawCanvas()
 
     
     
@@ -1171,57 +2019,83 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         if self.debug:
              print("Making 2D plot")
 
-        if self.datarange_auto.isChecked():
-            if self.datarange_center.isChecked():
-                 cmax = np.max(self.data)
-                 cmin = - cmax
-            else:
-                cmin = np.min(self.data)
-                cmax = np.max(self.data)
-        else:
-            cmin = float(self.datarange_a.text())
-            cmax = float(self.datarange_b.text())
-            
-        levels = np.linspace(cmin, cmax, num=50)
+        cmin, cmax = self.dataRange()
         
         cmap_key = self.colormap_field.currentText()
         cmname = self.colormap_dict[cmap_key]
-        colormap = matplotlib.cm.get_cmap(name=cmname)
-        
-        self.canvas_ax = self.canvas.figure.subplots()
-        
-        #Setup axis formats
-        self.canvas_ax.ticklabel_format(axis='x', scilimits=(-3,3) )
-        self.canvas_ax.ticklabel_format(axis='y', scilimits=(-3,3) )
-        
+        colormap = get_colormap(cmname)
         
         #Set aspect ratio
         if self.aspect_ratio_check.isChecked():
             aspect = 'equal'
         else:
             aspect = 'auto'
-
-        #Make a contour plot or image plot, depending on the selection
-        if self.plotContourBtn.isChecked():
-            cs = self.canvas_ax.contourf(self.hax['ax'], self.vax['ax'], 
-                                         self.data, levels, cmap=colormap,
-                                         aspect=aspect)
-        else:
-            cs = self.canvas_ax.imshow(self.data, origin='lower',
-                                       vmin=cmin, vmax=cmax,
-                                       aspect=aspect, interpolation = 'nearest',
-                                       extent=[self.hax['ax'][0], self.hax['ax'][-1], 
-                                               self.vax['ax'][0], self.vax['ax'][-1]],
-                                       cmap = colormap)
-
-        if np.max( np.abs(self.data ) ) > 100 or np.max( np.abs(self.data ) ) < 0.01:
+            
+        extent = [self.hax['ax'][0], self.hax['ax'][-1], 
+                  self.vax['ax'][0], self.vax['ax'][-1]]
+        
+        absmax = max(abs(self.data_extent[0]), abs(self.data_extent[1]))
+        if absmax > 100 or absmax < 0.01:
             cbformat = '%.1e'
         else:
             cbformat = '%.1f'
-
-        cbar = self.canvas.figure.colorbar(cs, orientation='horizontal', 
-                                           format=cbformat)
-        cbar.ax.set_xlabel('(' + str(self.data_unit_field.text()) + ')' )
+            
+        
+        layout = self.canvasLayout()
+        if layout == '2D' and self.canvas_layout == '2D':
+            #Update the existing image and colorbar in place
+            self.canvas_image.set_data(self.data)
+            self.canvas_image.set_extent(extent)
+            self.canvas_image.set_cmap(colormap)
+            self.canvas_image.set_clim(cmin, cmax)
+            self.canvas_ax.set_xlim(extent[0], extent[1])
+            self.canvas_ax.set_ylim(extent[2], extent[3])
+            self.canvas_ax.set_aspect(aspect)
+            
+            if cbformat != self.canvas_cbformat:
+                self.canvas_cbar.formatter = matplotlib.ticker.FormatStrFormatter(cbformat)
+                self.canvas_cbar.update_ticks()
+                self.canvas_cbformat = cbformat
+                
+        else:
+            self.clearCanvas(draw=False)
+            self.canvas_ax = self.canvas.figure.subplots()
+            
+            #Setup axis formats
+            self.canvas_ax.ticklabel_format(axis='x', scilimits=(-3,3) )
+            self.canvas_ax.ticklabel_format(axis='y', scilimits=(-3,3) )
+            
+            #Make a contour plot or image plot, depending on the selection
+            if layout == 'contour':
+                levels = np.linspace(cmin, cmax, num=50)
+                cs = self.canvas_ax.contourf(self.hax['ax'], self.vax['ax'], 
+                                             self.data, levels, cmap=colormap)
+                self.canvas_ax.set_aspect(aspect)
+            else:
+                cs = self.canvas_ax.imshow(self.data, origin='lower',
+                                           vmin=cmin, vmax=cmax,
+                                           aspect=aspect, interpolation = 'nearest',
+                                           extent=extent,
+                                           cmap = colormap, animated=True)
+                self.canvas_image = cs
+                self.canvas_ax.title.set_animated(True)
+    
+            self.canvas_cbar = self.canvas.figure.colorbar(cs, orientation='horizontal', 
+                                                           format=cbformat)
+            self.canvas_cbformat = cbformat
+            self.canvas_layout = layout
+            
+            #Zooming in may need finer data to be loaded
+            self.canvas_ax.callbacks.connect('xlim_changed', self.onLimitsChanged)
+            self.canvas_ax.callbacks.connect('ylim_changed', self.onLimitsChanged)
+            
+        #While zoomed in, keep the zoomed limits rather than the extent of
+        #the data that was loaded for them
+        if self.view_limits is not None:
+            self.canvas_ax.set_xlim(self.view_limits[0])
+            self.canvas_ax.set_ylim(self.view_limits[1])
+            
+        self.canvas_cbar.ax.set_xlabel('(' + str(self.data_unit_field.text()) + ')' )
         
         self.canvas_ax.set_xlabel(str(self.hax['name']) + ' (' + str(self.hax['unit']) + ')')
         self.canvas_ax.set_ylabel(str(self.vax['name']) + ' (' + str(self.vax['unit']) + ')')
@@ -1229,10 +2103,95 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         
         title = self.plotTitle()
         self.canvas_ax.set_title(title)
+        
+        self.pointslabel.setText("Showing " + str(self.data.shape[1]) + " x " +
+                                 str(self.data.shape[0]) + " points")
 
-        self.canvas.draw()
+        self.drawCanvas()
         
         
+    def levelOfDetail(self):
+        #Level of detail reading only applies to 2D plots
+        return self.lodAct.isChecked() and self.plottype_field.currentIndex() == 1
+        
+        
+    def plotPixels(self):
+        #Size (width, height) in pixels of the area the data is drawn into
+        if self.canvas_ax is not None:
+            bbox = self.canvas_ax.bbox
+        else:
+            bbox = self.figure.bbox
+        return bbox.width, bbox.height
+    
+    
+    def lodSlice(self, i, a, b, horizontal):
+        #Narrow the range of axis i to the zoomed in view (if any), and pick
+        #a step so there is about one element per pixel
+        if self.lod_view is not None and i in self.lod_view:
+            a = max(a, self.lod_view[i][0])
+            b = min(b, self.lod_view[i][1])
+        width, height = self.plotPixels()
+        step = lod_step(b - a, width if horizontal else height)
+        return a, b, step
+    
+    
+    def onLimitsChanged(self, ax):
+        #Zooming changes the x and y limits one at a time, so wait until
+        #it settles before checking
+        self.lod_timer.start()
+        
+        
+    def checkLevelOfDetail(self):
+        #1D data is all in memory already, so only the drawing changes
+        if self.canvas_layout == '1D':
+            self.updateLine()
+            return
+        
+        if (not self.levelOfDetail() or self.canvas_ax is None or 
+            self.loaded_spec is None or self.loaded_spec['vax'] is None):
+            return
+        
+        width, height = self.plotPixels()
+        limits = (self.canvas_ax.get_xlim(), self.canvas_ax.get_ylim())
+        view = {}
+        full = True
+        reload = False
+        for spec_ax, lim, pixels in ((self.loaded_spec['hax'], limits[0], width),
+                                     (self.loaded_spec['vax'], limits[1], height)):
+            dim = spec_ax['dim']
+            ax = self.axes[dim]
+            a = int(ax['ind_a'].value())
+            b = int(ax['ind_b'].value())
+            
+            #Index range currently visible
+            lo, hi = sorted((self.valToInd(lim[0], ax['ax'], ax['unit_factor']),
+                             self.valToInd(lim[1], ax['ax'], ax['unit_factor'])))
+            lo = max(int(lo), a)
+            hi = min(int(hi) + 1, b)
+            
+            #A strided read may stop short of the end of the range by up to
+            #one step, so count that as showing the whole range
+            loaded = spec_ax['slice']
+            if hi > b - loaded.step:
+                hi = b
+            view[dim] = (lo, hi)
+            full = full and lo == a and hi == b
+            
+            #Reload if part of the view isn't loaded, or it is loaded at a
+            #coarser resolution than the screen can now show
+            if (lo < loaded.start or hi > loaded.stop or 
+                lod_step(hi - lo, pixels) < loaded.step):
+                reload = True
+        
+        if reload:
+            if self.debug:
+                print("Reloading data for zoomed view " + str(view))
+            self.lod_view = None if full else view
+            self.view_limits = limits
+            self.markDirty('data')
+            self.redraw.request()
+            
+            
     def plotTitle(self):
         
         # If not auto, use custom text
@@ -1298,11 +2257,70 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         
         savefile = savedialog.getSaveFileName(self, "Save as: ", suggested_name, "")[0]
         self.figure.savefig(savefile)
+        self.blit_background = None
         
         #Update plotsave_dir varaible
         self.plotsave_dir = os.path.dirname(savefile)
         
         
+    def plotConfig(self):
+        #The current plot settings as a plot config (see render_figure), so
+        #the same plot can be made without the GUI
+        config = default_plot_config()
+        if self.plottype_field.currentIndex() == 0:
+            config['plot_type'] = '1D'
+            config['axes'] = [self.axes[self.cur_axes[0]]['name']]
+        else:
+            config['plot_type'] = '2D'
+            config['axes'] = [self.axes[i]['name'] for i in self.cur_axes]
+            
+        for ax in self.axes:
+            a = int(ax['ind_a'].value())
+            b = int(ax['ind_b'].value())
+            if ax['name'] in config['axes'] or ax['avgcheckbox'].isChecked():
+                config['ranges'][ax['name']] = [a, b]
+            else:
+                config['index'][ax['name']] = a
+            if ax['avgcheckbox'].isChecked():
+                config['avg'].append(ax['name'])
+            config['units'][ax['name']] = ax['disp_unit']
+        config['data_unit'] = self.data_cur_unit
+        
+        if self.lowpass_checkbox.isChecked():
+            config['filter'] = 'lowpass'
+        elif self.highpass_checkbox.isChecked():
+            config['filter'] = 'highpass'
+        config['sigma'] = self.filter_sigma.value()
+        
+        if not self.datarange_auto.isChecked():
+            config['range'] = [float(self.datarange_a.text()), 
+                               float(self.datarange_b.text())]
+        config['center_zero'] = self.datarange_center.isChecked()
+        config['colormap'] = self.colormap_dict[self.colormap_field.currentText()]
+        config['contour'] = self.plotContourBtn.isChecked()
+        config['aspect'] = 'equal' if self.aspect_ratio_check.isChecked() else 'auto'
+        config['float32'] = self.float32Act.isChecked()
+        if not self.plot_title_checkbox.isChecked():
+            config['title'] = self.plot_title.text()
+        return config
+    
+    
+    def saveConfig(self):
+        if self.debug:
+            print("Saving plot config")
+        if self.session is None:
+            return
+        savedialog = QtWidgets.QFileDialog()
+        if self.plotsave_dir == '':
+             self.plotsave_dir = os.path.dirname(self.filepath)
+        suggested_name = os.path.join(self.plotsave_dir, 'dataview_config.json')
+        savefile = savedialog.getSaveFileName(self, "Save config as: ", 
+                                              suggested_name, "JSON (*.json)")[0]
+        if savefile == '':
+            return
+        save_plot_config(self.plotConfig(), savefile)
+        
+        
     #**************************************************************************
     # Movie Functions
     #**************************************************************************
@@ -1314,10 +2332,17 @@ class ApplicationWindow(QtWidgets.QMainWindow):
             
         opendialog = QtWidgets.QFileDialog()
         save_dir =  opendialog.getExistingDirectory(self, "Select movie frame save directory")
+        #Keep the old directory (or none) if the dialog was cancelled, 
+        #pathlibPath('') would be the working directory
+        if save_dir == '':
+            return
         self.movie_dir_line.setText(save_dir)
         self.movie_dir = pathlibPath(save_dir)
         
     def modifyMovieDir(self):
+        if self.movie_dir_line.text() == '':
+            self.movie_dir = ''
+            return
         self.movie_dir = pathlibPath(self.movie_dir_line.text())
         self.movie_dir.mkdir(exist_ok=True)
 
@@ -1325,6 +2350,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         saveframe = os.path.join(os.path.splitext(self.movie_dir)[0], str(ax) + '_' +
             "{:4.2f}".format(val) + '.png')
         self.figure.savefig(saveframe)
+        self.blit_background = None
 
             
     def runMovie(self):
@@ -1359,7 +2385,8 @@ class ApplicationWindow(QtWidgets.QMainWindow):
                         i = ax['ind_a'].value()
                         
                     self.updateAxesFields()
-                    self.makePlot()
+                    #The frame has to be finished before it can be saved
+                    self.makePlot(blocking=True)
                     self.saveMovieFrame(ax_name, i)
                     
                 #Process events to catch any interupts
@@ -1372,17 +2399,203 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.movie_run_button.setText("Run")
 
         
-    def numFormat(self, n):
-        if n == int(n):
-            return '%d' % n
-        elif n > 100 or n < 0.01:
-            return '%.2E' % n
+    def movieFrames(self):
+        #The index of the movie axis and the value used to name the file for
+        #each frame, the same as runMovie steps through
+        start = self.movie_start.value()
+        stop = self.movie_stop.value()
+        num = self.movie_num.value()
+        rng = np.linspace(start, stop+1, num=int(num))
+        
+        ax_name = self.movie_ax.currentText()
+        for axis in self.axes:
+            if axis['name'] == ax_name:
+                ax = axis
+                
+        frames = []
+        for i in rng:
+            if ax['valbtn'].isChecked():
+                ind = int(self.valToInd(i, ax['ax'], ax['unit_factor']))
+                val = self.indToVal(ind, ax['ax'], ax['unit_factor'])
+            else:
+                ind = int(self.forceInRange(round(i), *ax['indminmax']))
+                val = ind
+            frames.append((ind, val))
+        return frames
+    
+    
+    def updateMovieFormatAction(self):
+        #Only ffmpeg formats have a choice of codec
+        ext = MOVIE_FORMATS[self.movie_format.currentText()]
+        self.movie_codec.clear()
+        for codec in MOVIE_CODECS.get(ext, []):
+            self.movie_codec.addItem(codec)
+        self.movie_codec.setEnabled(self.movie_codec.count() > 0)
+        self.movie_fps.setEnabled(ext is not None)
+        
+        
+    def exportMovie(self):
+        if self.debug:
+            print("Exporting movie")
+        if self.session is None or self.movie_export is not None:
+            return
+        if self.movie_dir == '':
+            self.setMovieDir()
+            if self.movie_dir == '':
+                return
+            
+        #Everything about the plot is frozen now, so the GUI can keep being
+        #used while the frames are rendered. The data range shown now is 
+        #used for every frame so the colors mean the same thing throughout.
+        config = self.plotConfig()
+        config['range'] = [float(x) for x in self.dataRange()]
+        ax_name = self.movie_ax.currentText()
+        if ax_name in config['axes'] or ax_name in config['avg']:
+            self.warninglabel.setText("WARNING: The movie axis can't be plotted or averaged")
+            return
+        if self.plot_title_checkbox.isChecked():
+            config['movie_axis'] = ax_name
+        
+        frames = self.movieFrames()
+        indices = [ind for ind, val in frames]
+        
+        #Either each frame is saved as a PNG by the worker that renders it, 
+        #or the workers send back the frames' pixels to be encoded here, in
+        #order, into one movie file
+        ext = MOVIE_FORMATS[self.movie_format.currentText()]
+        writer = None
+        if ext is None:
+            outputs = [os.path.join(str(self.movie_dir), str(ax_name) + '_' +
+                                    "{:4.2f}".format(val) + '.png') 
+                       for ind, val in frames]
         else:
-            return '%.2f' % n
+            if ext in MOVIE_CODECS and find_ffmpeg() is None:
+                self.warninglabel.setText("WARNING: ffmpeg wasn't found, " + 
+                                          "saving the movie as a GIF instead")
+                ext = 'gif'
+            path = os.path.join(str(self.movie_dir), str(ax_name) + '.' + ext)
+            writer = MovieWriter(path, fps=self.movie_fps.value(),
+                                 codec=self.movie_codec.currentText() or None)
+            outputs = [None]*len(frames)
+        
+        #Frames are handed out in chunks so each worker only opens the file 
+        #once per chunk, but with enough chunks to keep every worker busy, 
+        #to keep the frames sent back small, and to be able to cancel part 
+        #way through
+        workers = max(1, min(self.movie_workers, len(frames)))
+        nchunks = min(len(frames), max(4*workers, 
+                                       int(np.ceil(len(frames)/MOVIE_CHUNK_FRAMES))))
+        edges = np.linspace(0, len(frames), nchunks + 1).astype(int)
+        
+        #Worker processes are started fresh rather than forked from the GUI
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                          mp_context=multiprocessing.get_context('spawn'))
+        futures = {}
+        for chunk, (a, b) in enumerate(zip(edges[:-1], edges[1:])):
+            future = pool.submit(render_movie_frames, self.filepath, config, 
+                                 ax_name, indices[a:b], outputs[a:b])
+            futures[future] = (chunk, int(b - a))
+        
+        progress = QtWidgets.QProgressDialog("Exporting " + str(len(frames)) + 
+                                             " movie frames", "Cancel", 
+                                             0, len(frames), self)
+        progress.setMinimumDuration(0)
+        progress.setValue(0)
+        progress.canceled.connect(self.cancelMovieExport)
+        
+        timer = QtCore.QTimer()
+        timer.setInterval(100)
+        timer.timeout.connect(self.pollMovieExport)
+        timer.start()
+        
+        self.movie_export = {'pool':pool, 'futures':futures, 'done':0, 
+                             'errors':[], 'progress':progress, 'timer':timer,
+                             'writer':writer, 'results':{}, 'next_chunk':0,
+                             'start':time.perf_counter()}
+        self.movie_export_button.setEnabled(False)
+        
+        
+    def pollMovieExport(self):
+        export = self.movie_export
+        if export is None:
+            return
+        if export['progress'].wasCanceled():
+            self.cancelMovieExport()
+            return
+        for future in [f for f in export['futures'] if f.done()]:
+            chunk, nframes = export['futures'].pop(future)
+            export['done'] += nframes
+            try:
+                entries = future.result()
+            except Exception as e:
+                entries = [{'file':None, 'error':str(e), 'frame':None}]
+            export['errors'] += [entry for entry in entries
+                                 if entry['error'] is not None]
+            export['results'][chunk] = entries
+            
+        #Chunks can finish out of order, but go into the movie in order
+        try:
+            while export['next_chunk'] in export['results']:
+                entries = export['results'].pop(export['next_chunk'])
+                export['next_chunk'] += 1
+                if export['writer'] is not None:
+                    for entry in entries:
+                        if entry.get('frame') is not None:
+                            export['writer'].write(entry['frame'])
+        except OSError as e:
+            export['errors'].append({'file':None, 'error':str(e)})
+            self.cancelMovieExport()
+            return
+            
+        export['progress'].setValue(export['done'])
+        if len(export['futures']) == 0:
+            self.finishMovieExport()
+            
+            
+    def cancelMovieExport(self, wait=False):
+        if self.movie_export is None:
+            return
+        if self.debug:
+            print("Cancelling movie export")
+        #Chunks that have started are left to finish in the background, 
+        #unless wait (e.g. when the window is closing)
+        self.movie_export['pool'].shutdown(wait=wait, cancel_futures=True)
+        self.movie_export['futures'] = {}
+        self.finishMovieExport(cancelled=True)
+        
+        
+    def finishMovieExport(self, cancelled=False):
+        export = self.movie_export
+        self.movie_export = None
+        export['timer'].stop()
+        export['pool'].shutdown(wait=False)
+        export['progress'].close()
+        self.movie_export_button.setEnabled(True)
+        if export['writer'] is not None:
+            try:
+                export['writer'].close()
+            except OSError as e:
+                export['errors'].append({'file':None, 'error':str(e)})
+        
+        if self.debug:
+            print("Movie export took " + 
+                  '{:.2f}'.format(time.perf_counter() - export['start']) + " s")
+        if cancelled:
+            self.warninglabel.setText("Movie export cancelled")
+        elif len(export['errors']) > 0:
+            print(export['errors'][0]['error'])
+            self.warninglabel.setText("WARNING: " + str(len(export['errors'])) + 
+                                      " movie frames failed to render")
+            
+        
+    def numFormat(self, n):
+        return num_format(n)
        
           
     def valToInd(self, val, ax, unit_factor):
-         ind = np.argmin(np.abs(ax*unit_factor - val))
+         if isinstance(ax, LazyAxis):
+              return ax.index(val/unit_factor)
+         ind = nearest_index(np.asarray(ax)*unit_factor, val)
          return ind
     
     def indToVal(self, ind, ax, unit_factor):
@@ -1397,14 +2610,1242 @@ class ApplicationWindow(QtWidgets.QMainWindow):
               return a
          else:
               return x
-          
-            
 
 
-# This website helped with code for the scientific notation QSpinBox   
-# https://jdreaver.com/posts/2014-07-28-scientific-notation-spin-box-pyside.html         
-# Regular expression to find floats. Match groups are the whole string, the
-# whole coefficient, the decimal part of the coefficient, and the exponent
+
+
+#Redraw requests are coalesced within one pass of the event loop (a 0 ms 
+#timer) by default. A longer debounce window (in ms) also merges requests 
+#made in quick succession, e.g. while an arrow key is held down.
+REDRAW_DEBOUNCE_MS = 0
+
+class RedrawScheduler():
+    """Runs function (the plot pipeline) once the event loop is free of
+    requests for it, however many requests were made in the meantime."""
+    
+    def __init__(self, function, debounce=REDRAW_DEBOUNCE_MS):
+        self.function = function
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(debounce)
+        self.timer.timeout.connect(self.run)
+        self.requests = 0
+        self.runs = 0
+        #Requests merged into another run instead of running themselves
+        self.suppressed = 0
+        
+    def setDebounce(self, debounce):
+        self.timer.setInterval(debounce)
+        
+    def request(self):
+        self.requests += 1
+        if self.timer.isActive():
+            self.suppressed += 1
+        #Restarting the timer pushes the run to the end of the debounce window
+        self.timer.start()
+        
+    def pending(self):
+        return self.timer.isActive()
+        
+    def cancel(self):
+        #For callers that are about to run the function themselves
+        if self.timer.isActive():
+            self.timer.stop()
+            self.suppressed += 1
+            
+    def flush(self):
+        #Run now if a run is pending
+        if self.timer.isActive():
+            self.timer.stop()
+            self.run()
+            
+    def run(self):
+        self.runs += 1
+        self.function()
+        
+    def stats(self):
+        return {'requests': self.requests, 'runs': self.runs,
+                'suppressed': self.suppressed}
+
+
+
+#******************************************************************************
+# File access
+#******************************************************************************
+
+class H5Session():
+    """Open handle on a UCLAHEDP hdf5 file and its 'data' dataset."""
+
+    def __init__(self, filepath):
+        self.filepath = str(filepath)
+        self.file = None
+        self.data = None
+
+        #Incremented each time the file is (re)opened, so anything derived
+        #from the file contents can tell when it has gone stale
+        self.generation = 0
+
+        #(mtime, size, inode) of the file when it was last opened
+        self.stat = None
+
+        #Size of the chunk cache (decoded chunks kept in memory by hdf5) on
+        #the data dataset
+        self.chunk_cache_nbytes = CHUNK_CACHE_BYTES
+
+        #The data dataset mapped into memory, if it is stored in a way that
+        #allows it (see memmap_dataset)
+        self.memmap = None
+
+        #Precomputed overview of the file (see build_sidecar), if there is an
+        #up to date one
+        self.sidecar = None
+        self.sidecar_stale = False
+
+        self.open()
+
+    def _stat(self):
+        st = os.stat(self.filepath)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def open(self):
+        self.close()
+        self.stat = self._stat()
+        #w0=0 makes the chunk cache evict purely least-recently-used, rather
+        #than preferring to throw away chunks that have been read in full
+        self.file = h5py.File(self.filepath, 'r', 
+                              rdcc_nbytes=self.chunk_cache_nbytes,
+                              rdcc_nslots=chunk_cache_slots(self.chunk_cache_nbytes, None),
+                              rdcc_w0=0.0)
+        self.data = self.file['data']
+        self.memmap = memmap_dataset(self.filepath, self.data)
+        self.generation += 1
+        self.loadSidecar()
+
+    def loadSidecar(self):
+        if self.sidecar is not None:
+            self.sidecar.close()
+        self.sidecar, self.sidecar_stale = load_sidecar(self.filepath)
+
+    def setChunkCache(self, nbytes):
+        #Grow the chunk cache on the data dataset to at least nbytes (up to
+        #CHUNK_CACHE_MAX_BYTES). Returns True if the cache was resized.
+        nbytes = min(nbytes, CHUNK_CACHE_MAX_BYTES)
+        if self.file is None or nbytes <= self.chunk_cache_nbytes:
+            return False
+        
+        dapl = h5py.h5p.create(h5py.h5p.DATASET_ACCESS)
+        dapl.set_chunk_cache(chunk_cache_slots(nbytes, self.data), nbytes, 0.0)
+        self.data = h5py.Dataset(h5py.h5d.open(self.file.id, b'data', dapl))
+        self.chunk_cache_nbytes = nbytes
+        return True
+
+    def close(self):
+        if self.sidecar is not None:
+            self.sidecar.close()
+            self.sidecar = None
+        if self.file is not None:
+            try:
+                self.file.close()
+            except Exception:
+                pass
+        self.file = None
+        self.data = None
+        self.memmap = None
+
+    def changed(self):
+        try:
+            return self._stat() != self.stat
+        except OSError:
+            return True
+
+    def refresh(self):
+        #Reopen the file if it has been modified (or replaced) on disk since
+        #it was opened. Returns True if the file was reopened.
+        if self.file is None or self.changed():
+            self.open()
+            return True
+        return False
+
+    def __getitem__(self, name):
+        return self.file[name]
+    
+    def axis(self, name):
+        return LazyAxis(self, name)
+
+
+#Most elements read to estimate the step of an axis
+AXIS_SAMPLE_LENGTH = 4096
+#How far (relative to the step) the spacing of an axis can vary and still
+#be looked up as if it were uniform
+AXIS_UNIFORM_RTOL = 1e-3
+
+def monotonic_direction(arr):
+    """1 if arr is strictly increasing, -1 if strictly decreasing, else 0."""
+    if len(arr) < 2:
+        return 1
+    diffs = np.diff(arr)
+    if np.all(diffs > 0):
+        return 1
+    elif np.all(diffs < 0):
+        return -1
+    return 0
+
+
+def nearest_index(arr, val, monotonic=0):
+    """Index of the element of arr nearest to val. If arr is known to be
+    increasing (monotonic=1) or decreasing (-1) this is a binary search, 
+    otherwise every element is checked."""
+    n = len(arr)
+    if monotonic == 0 or n < 2:
+        return int(np.argmin(np.abs(arr - val)))
+    if monotonic < 0:
+        return n - 1 - nearest_index(arr[::-1], val, 1)
+    ind = int(np.searchsorted(arr, val))
+    if ind == 0:
+        return 0
+    elif ind == n:
+        return n - 1
+    #val is between arr[ind-1] and arr[ind]
+    return ind - 1 if val - arr[ind - 1] <= arr[ind] - val else ind
+
+
+class LazyAxis():
+    """One of the axis datasets of a file. Its length and endpoints come 
+    from the file metadata and two single element reads, and the whole 
+    array is only read (then kept) once something needs all of it, e.g.
+    np.asarray(axis). Indexing reads just the elements asked for."""
+    
+    def __init__(self, session, name):
+        self.session = session
+        self.name = name
+        dset = session[name]
+        self.shape = dset.shape
+        self.dtype = dset.dtype
+        self.unit = dset.attrs['unit']
+        self.array = None
+        if len(self) > 0:
+            self.first = dset[0]
+            self.last = dset[-1]
+        else:
+            self.first = self.last = 0
+            
+        #1 if increasing, -1 if decreasing, 0 if neither: a guess from the
+        #sample until the whole axis is loaded. Uniform axes (evenly spaced 
+        #in the sample) can be searched without loading anything.
+        self.monotonic = 0
+        self.uniform = False
+        #Set once an index worked out from the endpoints has been checked 
+        #against the elements around it in the file
+        self.checked = False
+        self.step = self.estimateStep()
+        
+    def __len__(self):
+        return self.shape[0]
+    
+    def estimateStep(self):
+        #Mean spacing over an evenly spaced subset of the axis
+        stride = max(1, len(self)//AXIS_SAMPLE_LENGTH)
+        sample = self.session[self.name][::stride].astype(np.float64)
+        self.monotonic = monotonic_direction(sample)
+        if self.monotonic != 0 and len(self) > 1:
+            diffs = np.diff(sample)
+            spacing = (self.last - self.first)/(len(self) - 1)*stride
+            self.uniform = bool(np.all(np.abs(diffs - spacing) <= 
+                                       AXIS_UNIFORM_RTOL*np.abs(spacing)))
+        try:
+            return np.mean(np.gradient(sample))/stride
+        except ValueError:
+            return 1
+    
+    def load(self):
+        if self.array is None:
+            self.array = self.session[self.name][:]
+            self.monotonic = monotonic_direction(self.array)
+        return self.array
+    
+    def index(self, val):
+        """Index of the element nearest to val."""
+        n = len(self)
+        if self.uniform:
+            #Work out where val should be from the endpoints. The first time,
+            #check the elements around there: if the nearest one isn't 
+            #inside that window the axis isn't as uniform as it looked, so 
+            #search it properly. After that nothing is read from the file.
+            guess = int(round((val - self.first)/(self.last - self.first)*(n - 1)))
+            guess = min(max(guess, 0), n - 1)
+            if self.checked:
+                return guess
+            lo = max(guess - 2, 0)
+            hi = min(guess + 3, n)
+            window = np.asarray(self[lo:hi], dtype=np.float64)
+            ind = lo + int(np.argmin(np.abs(window - val)))
+            if (ind > lo or lo == 0) and (ind < hi - 1 or hi == n):
+                self.checked = ind == guess
+                return ind
+            self.uniform = False
+        return nearest_index(self.load(), val, self.monotonic)
+    
+    def __array__(self, dtype=None, copy=None):
+        arr = self.load()
+        return arr if dtype is None else arr.astype(dtype, copy=False)
+    
+    def __getitem__(self, key):
+        if self.array is not None:
+            return self.array[key]
+        if isinstance(key, (int, np.integer)):
+            if key == 0 or key == -len(self):
+                return self.first
+            elif key == len(self) - 1 or key == -1:
+                return self.last
+        return self.session[self.name][key]
+
+
+
+#Chunk cache (rdcc_nbytes) the data dataset is opened with, and the most it
+#will be grown to so that every chunk touched by a read stays decoded. In the
+#GUI this comes out of the slice cache's budget (SLICE_CACHE_BYTES), so it is
+#capped at half of it.
+CHUNK_CACHE_BYTES = 16*1024**2
+CHUNK_CACHE_MAX_BYTES = 256*1024**2
+
+def chunk_cache_slots(nbytes, dset):
+    #hdf5 recommends a prime number of hash slots, ~100x the number of
+    #chunks that fit in the cache
+    if dset is None or dset.chunks is None:
+        nchunks = 16
+    else:
+        chunk_bytes = int(np.prod(dset.chunks))*dset.dtype.itemsize
+        nchunks = max(nbytes//chunk_bytes, 1)
+    n = max(100*nchunks, 521) | 1
+    while any(n % p == 0 for p in range(3, int(n**0.5)+1, 2)):
+        n += 2
+    return n
+
+
+def plan_read(dset, dslice):
+    """Estimate how much of dset has to be decompressed to read dslice."""
+    plan = {'shape': dset.shape, 'chunks': dset.chunks,
+            'compression': dset.compression,
+            'compression_opts': dset.compression_opts,
+            'shuffle': dset.shuffle}
+    
+    itemsize = dset.dtype.itemsize
+    nreturned = 1
+    nchunks = 1
+    for s, n, c in zip(dslice, dset.shape, dset.chunks or dset.shape):
+        start, stop, step = s.indices(n)
+        length = len(range(start, stop, step))
+        nreturned *= length
+        if length == 0:
+            continue
+        last = start + (length-1)*step
+        if step >= c:
+            #Every element along this axis is in a different chunk
+            nchunks *= length
+        else:
+            nchunks *= last//c - start//c + 1
+            
+    plan['bytes_returned'] = nreturned*itemsize
+    if dset.chunks is None:
+        #Contiguous data is read directly, nothing is decoded
+        plan['nchunks'] = 0
+        plan['bytes_touched'] = plan['bytes_returned']
+    else:
+        plan['nchunks'] = nchunks
+        plan['bytes_touched'] = nchunks*int(np.prod(dset.chunks))*itemsize
+    
+    if plan['bytes_returned'] > 0:
+        plan['amplification'] = plan['bytes_touched']/plan['bytes_returned']
+    else:
+        plan['amplification'] = 0.0
+    return plan
+
+
+def memmap_dataset(filepath, dset):
+    """Map dset into memory straight from the file, if it is stored as one
+    contiguous, unfiltered block. Returns None if it isn't."""
+    if dset.chunks is not None or dset.compression is not None or dset.size == 0:
+        return None
+    if dset.dtype.hasobject or dset.dtype.kind not in 'biuf':
+        return None
+    try:
+        offset = dset.id.get_offset()
+    except Exception:
+        offset = None
+    if offset is None:
+        #Not written yet, or stored in an external file
+        return None
+    try:
+        return np.memmap(filepath, dtype=dset.dtype, mode='r', 
+                         offset=offset, shape=dset.shape)
+    except (OSError, ValueError):
+        return None
+
+
+def scale(data, factor):
+    #Unit factors of 1 (the usual case) don't need a copy of the data
+    if factor == 1:
+        return data
+    return data*factor
+
+
+def slice_key(session, spec):
+    #Anything that changes the numbers in the arrays has to be in the key
+    return (session.filepath, spec['generation'],
+            tuple((s.start, s.stop, s.step) for s in spec['dslice']),
+            spec['avg_axes'], spec['transpose'],
+            spec['hax']['name'], spec['hax']['unit_factor'], 
+            None if spec['vax'] is None else spec['vax']['name'],
+            None if spec['vax'] is None else spec['vax']['unit_factor'],
+            spec.get('float32', False))
+
+
+def read_slice(session, spec, cache=None, is_current=None, profile=None):
+    """Read the slice described by spec, returning (hax, vax, data). The
+    data is in the file's units: the data unit factor is applied 
+    afterwards, by PostProcessor. The read is timed as the 'read' (or
+    'average') stage of profile, if given."""
+    stage = 'average' if len(spec['avg_axes']) != 0 else 'read'
+    with profile_stage(profile, stage) as record:
+        key = slice_key(session, spec)
+    
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        
+        #Bytes of the dataset selected (before any averaging)
+        record['bytes_read'] = slice_nbytes(spec, session.data.dtype.itemsize)
+    
+        f = session.file
+        sidecar = session.sidecar
+    
+        #Decimated reads (every n'th element along the plotted axes) come from
+        #a downsampled level of the overview sidecar if one matches
+        level = None
+        if sidecar is not None and len(spec['avg_dims']) == 0:
+            level = sidecar.findLevel(spec['dslice'])
+        
+        def axis_values(ax):
+            if level is None:
+                arr = f[ax['name']][ax['slice']]
+            else:
+                arr = level[2][ax['name']][level[1][ax['dim']]]
+            return scale(np.squeeze(arr), ax['unit_factor'])
+    
+        hax = axis_values(spec['hax'])
+    
+        #If selected, apply averaging. This is done while reading, so the whole
+        #range being averaged over never has to be in memory at once.
+        if len(spec['avg_axes']) != 0:
+            dset, dslice, avg_dims = session.data, spec['dslice'], spec['avg_dims']
+            dtype = compute_dtype(session.data.dtype, spec.get('float32', False))
+        
+            #An average over the whole of an axis may already be in the sidecar
+            if sidecar is not None:
+                reduction = sidecar.findReduction(dslice, avg_dims)
+                if reduction is not None:
+                    dset, dslice, avg_dims = reduction
+        
+            if len(avg_dims) == 0:
+                data = dset[dslice]
+            else:
+                data = read_mean(dset, dslice, avg_dims,
+                                 spec.get('avg_block_bytes', AVG_BLOCK_BYTES),
+                                 is_current=is_current, dtype=dtype)
+                if data is None:
+                    return None
+            data = np.squeeze(data).astype(dtype, copy=False)
+        elif level is not None:
+            data = np.squeeze(level[0][level[1]])
+        elif session.memmap is not None:
+            #A view straight into the file: nothing is read until the data is 
+            #used, and with a unit factor of 1 nothing is ever copied
+            data = np.squeeze(session.memmap[spec['dslice']])
+        else:
+            data = np.squeeze(session.data[spec['dslice']])
+    
+        #Give up early if this read has been superseded
+        if is_current is not None and not is_current():
+            return None
+        
+        #If 2D plot, do the vertical axis too
+        vax = None
+        if spec['vax'] is not None:
+            vax = axis_values(spec['vax'])
+            if spec['transpose']:
+                data = data.transpose()
+    
+        if cache is not None:
+            cache.put(key, (hax, vax, data))
+        return hax, vax, data
+
+
+#******************************************************************************
+# Overview sidecar files
+#******************************************************************************
+
+#A sidecar file next to the source file holds the mean/min/max of the data
+#over each (whole) axis, and pyramids of downsampled (block averaged) copies
+#of the data. A 2D plot decimates only its two axes, so there is a pyramid
+#for each pair of axes, halving the axes of the pair at least 
+#2*SIDECAR_LEVEL_MIN_LENGTH long at each level and keeping the others at 
+#full resolution (so a read at one index along them can use it too)
+SIDECAR_SUFFIX = '.dataview.h5'
+SIDECAR_VERSION = 2
+SIDECAR_BLOCK_BYTES = 256*1024**2
+SIDECAR_MAX_REDUCTION_BYTES = 1024**3
+SIDECAR_LEVEL_MIN_LENGTH = 256
+SIDECAR_MAX_LEVELS = 8
+#Bytes at each end of the source file that are hashed
+SIDECAR_HASH_BYTES = 1024**2
+
+def sidecar_path(filepath):
+    return os.path.splitext(str(filepath))[0] + SIDECAR_SUFFIX
+
+
+def source_hash(filepath):
+    #Hashing all of a multi-GB file would take about as long as building the
+    #sidecar, so only the size and the two ends of the file (where hdf5 keeps
+    #most of its metadata) are hashed
+    size = os.path.getsize(filepath)
+    h = hashlib.sha1(str(size).encode())
+    with open(filepath, 'rb') as f:
+        h.update(f.read(SIDECAR_HASH_BYTES))
+        if size > SIDECAR_HASH_BYTES:
+            f.seek(max(size - SIDECAR_HASH_BYTES, SIDECAR_HASH_BYTES))
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def sidecar_is_current(sidecar_file, filepath):
+    #The sidecar matches the source if the size matches and either the mtime
+    #matches or (e.g. for a copied file) the hash does. A sidecar missing
+    #any of these is treated as stale.
+    attrs = sidecar_file.attrs
+    st = os.stat(filepath)
+    if attrs.get('version', 0) != SIDECAR_VERSION:
+        return False
+    if attrs.get('source_size') != st.st_size:
+        return False
+    if attrs.get('source_mtime_ns') == st.st_mtime_ns:
+        return True
+    return attrs.get('source_hash') == source_hash(filepath)
+
+
+def load_sidecar(filepath):
+    """Open the sidecar for filepath, returning (sidecar or None, stale)."""
+    path = sidecar_path(filepath)
+    if not os.path.isfile(path):
+        return None, False
+    try:
+        sidecar = Sidecar(path)
+    except OSError:
+        return None, False
+    except (KeyError, ValueError):
+        #Laid out by an older version
+        return None, True
+    try:
+        current = sidecar_is_current(sidecar.file, filepath)
+    except (OSError, KeyError, ValueError):
+        current = False
+    if not current:
+        sidecar.close()
+        return None, True
+    return sidecar, False
+
+
+def block_mean(arr, factors):
+    #Average arr over blocks of factors[i] elements along each axis,
+    #dropping any leftover elements at the end of an axis
+    arr = arr[tuple(slice(0, (n//f)*f) for n, f in zip(arr.shape, factors))]
+    shape = []
+    for n, f in zip(arr.shape, factors):
+        shape += [n//f, f]
+    return arr.reshape(shape).mean(axis=tuple(range(1, 2*arr.ndim, 2)),
+                                   dtype=np.float64)
+
+
+def level_factors(shape, dims):
+    #Halve the dimensions dims that are long enough
+    return tuple(2 if d in dims and n >= 2*SIDECAR_LEVEL_MIN_LENGTH else 1 
+                 for d, n in enumerate(shape))
+
+
+def pyramid_dims(shape):
+    #The sets of dimensions a pyramid is needed for: the long enough ones
+    #among each pair of axes that could be plotted against each other
+    pairs = list(itertools.combinations(range(len(shape)), 2))
+    if len(shape) == 1:
+        pairs = [(0,)]
+    dims = set()
+    for pair in pairs:
+        key = tuple(d for d in pair if shape[d] >= 2*SIDECAR_LEVEL_MIN_LENGTH)
+        if len(key) > 0:
+            dims.add(key)
+    return sorted(dims)
+
+
+def slab_length(shape, itemsize, block_bytes, align):
+    #Number of indices along the first axis that fit in block_bytes,
+    #rounded down to a multiple of align. The levels are averaged over 
+    #blocks of align, so at least align are used even if they don't fit.
+    row = int(np.prod(shape[1:]))*itemsize
+    n = max(block_bytes//max(row, 1), 1)
+    n = max(n - n % align, align)
+    return min(n, shape[0])
+
+
+def build_sidecar(filepath, progress=None, block_bytes=SIDECAR_BLOCK_BYTES):
+    """Write the overview sidecar for filepath, returning its path.
+
+    The data is read once, a slab along the first axis at a time. progress
+    is called with the fraction done, and the build is abandoned (returning
+    None) if it returns False.
+    """
+    filepath = str(filepath)
+    path = sidecar_path(filepath)
+    tmp = path + '.tmp'
+    st = os.stat(filepath)
+    
+    try:
+        with h5py.File(filepath, 'r') as src, h5py.File(tmp, 'w') as dst:
+            dset = src['data']
+            shape = dset.shape
+            ndim = len(shape)
+            names = [n.decode('utf-8') for n in dset.attrs['dimensions']]
+            out_dtype = np.result_type(dset.dtype, np.float32)
+            
+            dst.attrs['version'] = SIDECAR_VERSION
+            dst.attrs['source'] = os.path.basename(filepath)
+            dst.attrs['source_size'] = st.st_size
+            dst.attrs['source_mtime_ns'] = st.st_mtime_ns
+            dst.attrs['source_hash'] = source_hash(filepath)
+            dst.attrs['dimensions'] = dset.attrs['dimensions']
+            dst.attrs['source_shape'] = shape
+            
+            #Reductions over each axis, skipping any that would be too big
+            #to be worth keeping
+            red = {}
+            for d in range(ndim):
+                rshape = shape[:d] + shape[d+1:]
+                if int(np.prod(rshape))*8 > SIDECAR_MAX_REDUCTION_BYTES:
+                    continue
+                grp = dst.create_group('reductions/' + names[d])
+                red[d] = {'mean': grp.create_dataset('mean', rshape, np.float64),
+                          'min': grp.create_dataset('min', rshape, dset.dtype),
+                          'max': grp.create_dataset('max', rshape, dset.dtype)}
+            
+            #The first level of each pyramid is made from the same slabs as 
+            #the reductions, so the slabs must split evenly into its blocks
+            pyramids = OrderedDict()
+            align = 1
+            for dims in pyramid_dims(shape):
+                factors = level_factors(shape, dims)
+                lshape = tuple(n//f for n, f in zip(shape, factors))
+                pyramid = dst.create_group('levels/' + '-'.join(names[d] for d in dims))
+                pyramid.attrs['dims'] = dims
+                grp = pyramid.create_group('1')
+                grp.attrs['factors'] = factors
+                pyramids[dims] = [(factors, grp.create_dataset('data', lshape, out_dtype))]
+                align = int(np.lcm(align, factors[0]))
+            
+            #Whole chunks are read too, if that still fits in block_bytes
+            if dset.chunks is not None:
+                chunk_align = int(np.lcm(align, dset.chunks[0]))
+                row = int(np.prod(shape[1:]))*dset.dtype.itemsize
+                if chunk_align*row <= block_bytes:
+                    align = chunk_align
+            nslab = slab_length(shape, dset.dtype.itemsize, block_bytes, align)
+            
+            acc = None
+            for a in range(0, shape[0], nslab):
+                b = min(a + nslab, shape[0])
+                slab = dset[a:b]
+                
+                for d, r in red.items():
+                    if d == 0:
+                        #Reductions along the slab axis build up over slabs
+                        if acc is None:
+                            acc = [slab.sum(axis=0, dtype=np.float64),
+                                   slab.min(axis=0), slab.max(axis=0)]
+                        else:
+                            acc[0] += slab.sum(axis=0, dtype=np.float64)
+                            np.minimum(acc[1], slab.min(axis=0), out=acc[1])
+                            np.maximum(acc[2], slab.max(axis=0), out=acc[2])
+                    else:
+                        r['mean'][a:b] = slab.mean(axis=d, dtype=np.float64)
+                        r['min'][a:b] = slab.min(axis=d)
+                        r['max'][a:b] = slab.max(axis=d)
+                        
+                for levels in pyramids.values():
+                    factors, level = levels[0]
+                    f0 = factors[0]
+                    down = block_mean(slab, factors)
+                    level[a//f0:a//f0 + down.shape[0]] = down
+                    
+                if progress is not None and not progress(0.8*b/shape[0]):
+                    return None
+            
+            if 0 in red:
+                red[0]['mean'][...] = acc[0]/shape[0]
+                red[0]['min'][...] = acc[1]
+                red[0]['max'][...] = acc[2]
+                
+            #Each further level is made from the one before it
+            for i, (dims, levels) in enumerate(pyramids.items()):
+                while len(levels) < SIDECAR_MAX_LEVELS:
+                    prev_factors, prev = levels[-1]
+                    factors = level_factors(prev.shape, dims)
+                    if not any(f > 1 for f in factors):
+                        break
+                    lshape = tuple(n//f for n, f in zip(prev.shape, factors))
+                    grp = prev.parent.parent.create_group(str(len(levels)+1))
+                    grp.attrs['factors'] = tuple(p*f for p, f in zip(prev_factors, factors))
+                    new = grp.create_dataset('data', lshape, out_dtype)
+                    
+                    nslab = slab_length(prev.shape, prev.dtype.itemsize, 
+                                        block_bytes, factors[0])
+                    for a in range(0, prev.shape[0], nslab):
+                        b = min(a + nslab, prev.shape[0])
+                        down = block_mean(prev[a:b], factors)
+                        new[a//factors[0]:a//factors[0] + down.shape[0]] = down
+                    levels.append((tuple(grp.attrs['factors']), new))
+                
+                if progress is not None and not progress(0.8 + 0.2*(i+1)/len(pyramids)):
+                    return None
+                    
+            #Each level gets its own (block averaged) copy of the axes
+            for levels in pyramids.values():
+                for factors, level in levels:
+                    for d, name in enumerate(names):
+                        ax = block_mean(src[name][:], (factors[d],))
+                        level.parent.create_dataset('axes/' + name, data=ax)
+    
+        os.replace(tmp, path)
+        if progress is not None:
+            progress(1.0)
+        return path
+    
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+            
+
+class Sidecar():
+    """Read access to an overview sidecar file (see build_sidecar)."""
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = h5py.File(path, 'r')
+        self.dimensions = [n.decode('utf-8') for n in self.file.attrs['dimensions']]
+        self.source_shape = tuple(int(n) for n in self.file.attrs['source_shape'])
+        
+        #(factors, group) for each downsampled level of every pyramid
+        self.levels = []
+        if 'levels' in self.file:
+            for pyramid in self.file['levels'].values():
+                for k in sorted(pyramid.keys(), key=int):
+                    grp = pyramid[k]
+                    self.levels.append((tuple(int(f) for f in grp.attrs['factors']), grp))
+                
+    def close(self):
+        try:
+            self.file.close()
+        except Exception:
+            pass
+        
+    def reduction(self, dim, kind='mean'):
+        name = 'reductions/' + self.dimensions[dim] + '/' + kind
+        if name in self.file:
+            return self.file[name]
+        return None
+    
+    def findReduction(self, dslice, avg_dims):
+        #If one of the averaged dimensions is averaged over in full, the 
+        #average can start from the precomputed mean over that dimension.
+        #Returns (dataset, dslice, remaining avg_dims) or None.
+        for d in avg_dims:
+            mean = self.reduction(d)
+            if mean is None:
+                continue
+            n = self.source_shape[d]
+            if dslice[d].indices(n) != (0, n, 1):
+                continue
+            rest = tuple(x - (x > d) for x in avg_dims if x != d)
+            return mean, tuple(dslice[:d]) + tuple(dslice[d+1:]), rest
+        return None
+    
+    def findLevel(self, dslice):
+        #The coarsest level that can answer a strided read: every
+        #downsampled dimension must be read with a step that is a multiple 
+        #of the level's factor along it. Returns (dataset, dslice, axes 
+        #group) or None.
+        best = None
+        for factors, grp in self.levels:
+            ok = True
+            for s, f in zip(dslice, factors):
+                if f > 1 and (s.step is None or s.step % f != 0):
+                    ok = False
+            if ok and (best is None or np.prod(factors) > np.prod(best[0])):
+                best = (factors, grp)
+        if best is None:
+            return None
+        factors, grp = best
+        data = grp['data']
+        lslice = []
+        for s, f, n in zip(dslice, factors, data.shape):
+            start = s.start//f
+            stop = min(-(-s.stop//f), n)
+            lslice.append(slice(start, stop, (s.step or 1)//f))
+        return data, tuple(lslice), grp['axes']
+
+
+
+#Default size of the blocks read from the file when averaging
+AVG_BLOCK_BYTES = 64*1024**2
+
+def block_edges(start, stop, length, chunk):
+    #Split range(start, stop) into blocks of at most length elements. If
+    #length is a multiple of the chunk size, the blocks are aligned to chunk
+    #boundaries so that no chunk is split between two blocks.
+    edges = [start]
+    if chunk is not None and length >= chunk and length % chunk == 0:
+        nxt = (start//chunk)*chunk + length
+    else:
+        nxt = start + length
+    while nxt < stop:
+        edges.append(nxt)
+        nxt += length
+    edges.append(stop)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def read_mean(dset, dslice, avg_dims, block_bytes, is_current=None, dtype=None):
+    """Mean of dset[dslice] over avg_dims, read block by block. The result
+    has the given dtype (by default, what np.mean would return)."""
+    shape = [len(range(*s.indices(n))) for s, n in zip(dslice, dset.shape)]
+    chunks = dset.chunks
+    itemsize = dset.dtype.itemsize
+    
+    #Elements per block that aren't along an averaged dimension
+    base = 1
+    for i, n in enumerate(shape):
+        if i not in avg_dims:
+            base *= n
+    
+    #Fill the block budget starting from the last (fastest varying) averaged
+    #dimension, rounding down to whole chunks where possible
+    budget = max(block_bytes//(base*itemsize), 1)
+    blocks = {}
+    for d in sorted(avg_dims, reverse=True):
+        length = min(shape[d], budget)
+        if chunks is not None and length > chunks[d]:
+            length -= length % chunks[d]
+        length = max(length, 1)
+        blocks[d] = length
+        budget = max(budget//length, 1)
+        
+    ranges = []
+    for d in avg_dims:
+        start, stop, step = dslice[d].indices(dset.shape[d])
+        ranges.append(block_edges(start, stop, blocks[d], 
+                                  None if chunks is None else chunks[d]))
+    
+    #Sums are accumulated in double precision whatever the file dtype is
+    acc = None
+    count = 0
+    for block in itertools.product(*ranges):
+        if is_current is not None and not is_current():
+            return None
+        sub = list(dslice)
+        for d, (a, b) in zip(avg_dims, block):
+            sub[d] = slice(a, b, 1)
+        arr = dset[tuple(sub)]
+        partial = arr.sum(axis=tuple(avg_dims), dtype=np.float64)
+        if acc is None:
+            acc = partial
+        else:
+            acc += partial
+        count += int(np.prod([b - a for a, b in block]))
+        
+    if dtype is None:
+        dtype = compute_dtype(dset.dtype)
+    return (acc/count).astype(dtype, copy=False)
+
+
+def compute_dtype(dtype, float32=False):
+    """The float dtype data of the given dtype is scaled/averaged/filtered
+    in: what numpy would promote it to, or float32 in float32 mode."""
+    if float32:
+        return np.dtype(np.float32)
+    return np.result_type(dtype, 1.0)
+
+
+def data_extent(data):
+    """(min, max) of data as Python (double precision) floats."""
+    if data.size == 0:
+        return 0.0, 0.0
+    return float(np.min(data)), float(np.max(data))
+
+
+def minmax_envelope(x, y, nbins):
+    """Decimate a trace to the smallest and largest point in each of nbins 
+    bins, keeping the first and last points, with each point at most once
+    and in order. Spikes survive, unlike 
+    striding or averaging. Traces with fewer than two points per bin are 
+    returned as they are."""
+    n = y.size
+    if nbins < 1 or n <= 2*nbins:
+        return x, y
+    
+    #Equal bins, with any remainder as one short last bin
+    per = n//nbins
+    m = per*nbins
+    blocks = y[:m].reshape(nbins, per)
+    offsets = np.arange(nbins)*per
+    imin = np.argmin(blocks, axis=1) + offsets
+    imax = np.argmax(blocks, axis=1) + offsets
+    
+    #Within each bin the two points go in x order
+    ind = [[0], np.sort(np.stack((imin, imax), axis=1), axis=1).ravel()]
+    if m < n:
+        ind.append(m + np.sort([np.argmin(y[m:]), np.argmax(y[m:])]))
+    ind.append([n - 1])
+    ind = np.concatenate(ind)
+    #The indices are in order, but the first and last points may also be
+    #their bin's min or max (and a flat bin's min and max are the same
+    #point), so drop the repeats
+    ind = ind[np.concatenate(([True], np.diff(ind) > 0))]
+    return x[ind], y[ind]
+
+
+def lod_step(n, pixels):
+    #Largest power of two step that still leaves at least one element per
+    #pixel (powers of two so reads line up with the sidecar levels)
+    step = 1
+    while n//(2*step) >= max(pixels, 1):
+        step *= 2
+    return step
+
+
+class PostProcessor():
+    """Turns data as read from the file into the data that is plotted: 
+    unit scaling, transposing (to C order) and filtering, done in one pass 
+    into preallocated buffers that are reused from plot to plot.
+    
+    There are two output buffers, used in turn, so the data being shown
+    (the one in slot front) isn't overwritten while the next plot is made. 
+    Each write is tagged with the request it was made for, and the caller
+    calls present() with the slot returned by process once that data is on
+    screen. A third, scratch buffer holds the blurred data for the highpass
+    filter."""
+    
+    def __init__(self):
+        self.buffers = [None, None]
+        self.scratch = None
+        self.front = 0
+        #The request_id whose data each slot holds
+        self.owners = [None, None]
+        #Only one set of buffers, so only one thread can use them at a time
+        self.lock = threading.Lock()
+        
+    def _buffer(self, buf, shape, dtype):
+        #Reuse buf if it is the right size, otherwise allocate a new one
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+        return buf
+    
+    def clear(self):
+        with self.lock:
+            self.buffers = [None, None]
+            self.scratch = None
+    
+    def process(self, raw, factor, filter_type, sigma, float32=False,
+                request_id=None, is_current=None):
+        """Returns (data, slot). raw itself is never modified, and is 
+        returned as it is if there is nothing to do. With float32 the data
+        is scaled and filtered in single precision. If is_current() is False
+        once the buffers are free, the request has been superseded and 
+        (None, None) is returned without writing to them."""
+        if factor == 1 and filter_type is None:
+            return raw, None
+        
+        with self.lock:
+            if is_current is not None and not is_current():
+                return None, None
+            slot = 1 - self.front
+            self.owners[slot] = request_id
+            dtype = compute_dtype(raw.dtype, float32)
+            out = self._buffer(self.buffers[slot], raw.shape, dtype)
+            self.buffers[slot] = out
+            
+            #Scale (and copy out of the file/cache, in C order) in one pass
+            np.multiply(raw, factor, out=out, casting='unsafe')
+            
+            if filter_type is not None:
+                from scipy import ndimage
+            if filter_type == 'lowpass':
+                ndimage.gaussian_filter(out, sigma, output=out)
+            elif filter_type == 'highpass':
+                self.scratch = self._buffer(self.scratch, raw.shape, dtype)
+                ndimage.gaussian_filter(out, sigma, output=self.scratch)
+                np.subtract(out, self.scratch, out=out)
+        return out, slot
+    
+    def present(self, slot, request_id):
+        """Make slot the front (shown) buffer, if it still holds the data
+        for request_id. Returns False if a later request has written over it."""
+        with self.lock:
+            if self.owners[slot] != request_id:
+                return False
+            self.front = slot
+            return True
+
+
+
+def prefetch_specs(last, spec, shape, depth):
+    """Specs for the next depth slices along the axis stepped from last to spec."""
+    #Everything except the dslice has to match
+    for k in spec.keys():
+        if k not in ('dslice', 'filter', 'sigma') and spec[k] != last.get(k):
+            return []
+    if len(spec['dslice']) != len(last['dslice']):
+        return []
+    
+    #Exactly one fixed (single index) axis should have moved
+    changed = [i for i, (s0, s1) in enumerate(zip(last['dslice'], spec['dslice']))
+               if s0 != s1]
+    if len(changed) != 1:
+        return []
+    i = changed[0]
+    s0, s1 = last['dslice'][i], spec['dslice'][i]
+    if s0.stop - s0.start != 1 or s1.stop - s1.start != 1:
+        return []
+    step = s1.start - s0.start
+    
+    specs = []
+    for n in range(1, depth+1):
+        ind = s1.start + n*step
+        if ind < 0 or ind >= shape[i]:
+            break
+        dslice = list(spec['dslice'])
+        dslice[i] = slice(ind, ind+1, 1)
+        new = dict(spec)
+        new['dslice'] = tuple(dslice)
+        specs.append(new)
+    return specs
+
+
+def slice_nbytes(spec, itemsize=8):
+    #Estimated size of the (by default float64) array read_slice returns 
+    #for spec
+    n = 1
+    for s in spec['dslice']:
+        n *= len(range(s.start, s.stop, s.step))
+    return n*itemsize
+
+
+
+class PrefetchWorker(QtCore.QRunnable):
+    """Reads a list of slices into the slice cache ahead of time."""
+    
+    def __init__(self, prefetch_id, session, specs, cache, max_bytes,
+                 is_current=None):
+        super().__init__()
+        self.prefetch_id = prefetch_id
+        self.session = session
+        self.specs = specs
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.current_check = is_current
+        
+    def isCurrent(self):
+        if self.current_check is None:
+            return True
+        return self.current_check(self.prefetch_id)
+        
+    def run(self):
+        QtCore.QThread.currentThread().setPriority(QtCore.QThread.LowPriority)
+        nbytes = 0
+        for spec in self.specs:
+            if not self.isCurrent():
+                return
+            key = slice_key(self.session, spec)
+            if key in self.cache:
+                continue
+            nbytes += slice_nbytes(spec)
+            if nbytes > self.max_bytes:
+                return
+            try:
+                #Bypass the cache on the read so read-ahead doesn't count 
+                #towards the hit/miss statistics
+                result = read_slice(self.session, spec, None,
+                                    is_current=self.isCurrent)
+            except Exception:
+                #Read-ahead is only an optimization, any real problem will
+                #be reported when the slice is actually requested
+                return
+            if result is None:
+                return
+            self.cache.put(key, result)
+
+
+
+class DataWorkerSignals(QtCore.QObject):
+    #QRunnable can't emit signals itself
+    finished = QtCore.pyqtSignal(int, object)
+    failed = QtCore.pyqtSignal(int, str)
+    
+    
+class DataWorker(QtCore.QRunnable):
+    """Reads and filters one data request on a QThreadPool thread."""
+    
+    def __init__(self, request_id, session, spec, cache, post, raw=None, 
+                 is_current=None, profile=None):
+        super().__init__()
+        self.request_id = request_id
+        self.session = session
+        self.spec = spec
+        self.cache = cache
+        self.post = post
+        #(hax, vax, raw_data) if only the filter needs to be rerun
+        self.raw = raw
+        self.current_check = is_current
+        #PlotProfile the read and filter stages are timed in (or None)
+        self.profile = profile
+        self.signals = DataWorkerSignals()
+        
+    def isCurrent(self):
+        if self.current_check is None:
+            return True
+        return self.current_check(self.request_id)
+        
+    def run(self):
+        #Requests that were superseded while waiting in the queue are skipped
+        if not self.isCurrent():
+            return
+        try:
+            if self.raw is None:
+                raw = read_slice(self.session, self.spec, self.cache,
+                                 is_current=self.isCurrent, profile=self.profile)
+                if raw is None:
+                    return
+            else:
+                raw = self.raw
+            hax, vax, raw_data = raw
+            
+            if not self.isCurrent():
+                return
+            with profile_stage(self.profile, 'filter'):
+                data, slot = self.post.process(raw_data, self.spec['data_unit_factor'],
+                                               self.spec['filter'], self.spec['sigma'],
+                                               float32=self.spec['float32'],
+                                               request_id=self.request_id,
+                                               is_current=self.isCurrent)
+                if data is None:
+                    return
+                extent = data_extent(data)
+            self.signals.finished.emit(self.request_id, 
+                                       (hax, vax, raw_data, data, slot, extent))
+        except Exception as e:
+            self.signals.failed.emit(self.request_id, 
+                                     type(e).__name__ + "!: " + str(e) + 
+                                     "\n" + traceback.format_exc())
+
+
+
+#Default memory budget for the slice cache, shared in the GUI with the chunk
+#cache of the open file (see ApplicationWindow.updateCacheBudget)
+SLICE_CACHE_BYTES = 512*1024**2
+
+#Default number of slices to read ahead when stepping along an axis, and the
+#memory they may use
+PREFETCH_DEPTH = 4
+PREFETCH_BYTES = 128*1024**2
+
+class SliceCache():
+    """Least-recently-used cache of data slices, bounded by total bytes."""
+
+    def __init__(self, max_bytes=SLICE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        #The cache is shared with the data worker thread
+        self.lock = threading.RLock()
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _size(self, value):
+        #Views of a memory mapped file are charged in full too: once the 
+        #slice has been scaled, filtered or drawn its pages are resident
+        return sum(v.nbytes for v in value if isinstance(v, np.ndarray))
+
+    def get(self, key):
+        with self.lock:
+            try:
+                value = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self._size(value)
+        #Don't let one huge slice flush everything else out of the cache
+        if size > self.max_bytes:
+            return
+
+        #Cached arrays are shared, so make sure nobody modifies them in place
+        for v in value:
+            if isinstance(v, np.ndarray):
+                v.flags.writeable = False
+
+        with self.lock:
+            if key in self.entries:
+                self.nbytes -= self._size(self.entries.pop(key))
+            self.entries[key] = value
+            self.nbytes += size
+            self.evict()
+
+    def evict(self):
+        with self.lock:
+            while self.nbytes > self.max_bytes and len(self.entries) > 0:
+                key, value = self.entries.popitem(last=False)
+                self.nbytes -= self._size(value)
+
+    def setMaxBytes(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.evict()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits/total if total > 0 else 0.0,
+                    'entries': len(self.entries), 'nbytes': self.nbytes,
+                    'max_bytes': self.max_bytes}
+
+
+
+# This website helped with code for the scientific notation QSpinBox
+# https://jdreaver.com/posts/2014-07-28-scientific-notation-spin-box-pyside.html         
+# Regular expression to find floats. Match groups are the whole string, the
+# whole coefficient, the decimal part of the coefficient, and the exponent
 # part.
 _float_re = re.compile(r'(([+-]?\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?)')
 
@@ -1460,6 +3901,103 @@ class ScientificDoubleSpinBox(QtWidgets.QDoubleSpinBox):
         self.lineEdit().setText(new_string)
 
 
+#Unit strings parsed in the background shortly (UNIT_WARMUP_DELAY ms) after
+#the GUI starts, so the first unit change doesn't have to wait for astropy
+#to be imported and set up its parser
+UNIT_WARMUP_DELAY = 2000
+COMMON_UNITS = ['', 's', 'ms', 'us', 'ns', 'V', 'mV', 'kV', 'A', 'kA', 
+                'm', 'cm', 'mm', 'um', 'G', 'T', 'Hz', 'kHz', 'MHz']
+
+class UnitConverter():
+    """Parses OGIP unit strings and works out the conversion factors 
+    between them, remembering both. One is shared (UNIT_CONVERTER) by every
+    axis and file."""
+    
+    def __init__(self):
+        self.units = {}
+        self.factors = {}
+        #Lookups in the factor cache (hits, misses) and in the parsed unit
+        #cache (unit_hits, unit_misses) are counted separately
+        self.hits = 0
+        self.misses = 0
+        self.unit_hits = 0
+        self.unit_misses = 0
+        #The astropy parser isn't thread safe, so parsing is done holding 
+        #the lock too
+        self.lock = threading.RLock()
+        
+    def unit(self, string):
+        #Raises ValueError if string isn't a valid unit
+        with self.lock:
+            if string in self.units:
+                self.unit_hits += 1
+            else:
+                self.unit_misses += 1
+                from astropy import units
+                try:
+                    self.units[string] = units.Unit(string, parse_strict='raise', 
+                                                    format='ogip')
+                except ValueError as e:
+                    self.units[string] = e
+            result = self.units[string]
+        if isinstance(result, Exception):
+            raise ValueError(str(result))
+        return result
+    
+    def factor(self, native, target):
+        """Factor converting values in the native unit to the target unit.
+        Raises ValueError if either unit is invalid or they aren't 
+        compatible."""
+        key = (native, target)
+        with self.lock:
+            if key in self.factors:
+                self.hits += 1
+                return self.factors[key]
+            self.misses += 1
+        #Kept as a numpy float64 (like Quantity.value), so float32 axes
+        #scaled by it (see scale) are promoted rather than rounded. The data 
+        #isn't: PostProcessor multiplies it into a buffer of its compute 
+        #dtype, which stays float32 for float32 data (see compute_dtype).
+        factor = np.float64(self.unit(native).to(self.unit(target)))
+        with self.lock:
+            self.factors[key] = factor
+        return factor
+    
+    def warmUp(self, strings=COMMON_UNITS):
+        #Parse some units on a background thread
+        def run():
+            for string in strings:
+                try:
+                    self.unit(string)
+                except ValueError:
+                    pass
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+    
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            unit_total = self.unit_hits + self.unit_misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits/total if total > 0 else 0.0,
+                    'unit_hits': self.unit_hits, 'unit_misses': self.unit_misses,
+                    'unit_hit_rate': self.unit_hits/unit_total if unit_total > 0 else 0.0,
+                    'units': len(self.units), 'factors': len(self.factors)}
+        
+        
+UNIT_CONVERTER = UnitConverter()
+
+
+def get_colormap(name):
+    #matplotlib.cm.get_cmap was removed in newer versions of matplotlib
+    try:
+        return matplotlib.colormaps[name]
+    except AttributeError:
+        from matplotlib import cm
+        return cm.get_cmap(name=name)
+
+
 def format_float(value):
     """Modified form of the 'g' format specifier."""
     string = "{:g}".format(value).replace("e+", "e")
@@ -1467,8 +4005,716 @@ def format_float(value):
     return string
 
 
+#******************************************************************************
+# Profiling
+#******************************************************************************
+#When profiling is on (Options > Performance), each run of the plot pipeline
+#is recorded as a PlotProfile: the wall time of each stage, the bytes it read
+#from the file and its slice cache hit rate. The peak memory allocated while
+#the plot was made is recorded for the whole run rather than per stage: 
+#tracemalloc (which numpy reports its arrays to) only has one, process-wide 
+#peak, and stages run on the worker threads at the same time. The last 
+#PROFILE_HISTORY of them are kept, and can be saved as a Chrome trace 
+#(chrome://tracing or https://ui.perfetto.dev)
+
+PROFILE_STAGES = ['validate', 'read', 'average', 'filter', 'draw']
+PROFILE_HISTORY = 50
+
+class Profiler():
+    """Keeps the profiles of the last few runs of the plot pipeline."""
+    
+    def __init__(self, cache=None, history=PROFILE_HISTORY):
+        #Slice cache whose hits and misses are counted
+        self.cache = cache
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.history = deque(maxlen=history)
+        self.count = 0
+        #Trace timestamps are relative to this
+        self.origin = time.perf_counter()
+        self.started_tracemalloc = False
+        
+    def setEnabled(self, enabled):
+        self.enabled = enabled
+        #Don't stop tracemalloc if somebody else started it
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        elif not enabled and self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+            
+    def begin(self, label):
+        """Start a new profile, or return None if profiling is off."""
+        if not self.enabled:
+            return None
+        with self.lock:
+            self.count += 1
+            profile = PlotProfile(self, self.count, label)
+        #The peak is over every thread, including reads for other plots
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            profile.mem_start = tracemalloc.get_traced_memory()[0]
+        return profile
+        
+    def finish(self, profile):
+        profile.end = time.perf_counter()
+        profile.units = UNIT_CONVERTER.stats()
+        if profile.mem_start is not None and tracemalloc.is_tracing():
+            profile.peak_memory = max(tracemalloc.get_traced_memory()[1] 
+                                      - profile.mem_start, 0)
+        if self.cache is not None:
+            profile.cache = self.cache.stats()
+        with self.lock:
+            self.history.append(profile)
+            
+    def clear(self):
+        with self.lock:
+            self.history.clear()
+            
+    def cacheCounts(self):
+        if self.cache is None:
+            return 0, 0
+        return self.cache.hits, self.cache.misses
+            
+    def traceEvents(self):
+        """The history as a list of Chrome trace events."""
+        pid = os.getpid()
+        events = []
+        threads = {}
+        with self.lock:
+            history = list(self.history)
+        for profile in history:
+            events.append({'name':'plot ' + str(profile.plot_id) + 
+                           ' (' + profile.label + ')',
+                           'cat':'plot', 'ph':'X', 'pid':pid, 
+                           'tid':profile.tid,
+                           'ts':(profile.start - self.origin)*1e6, 
+                           'dur':(profile.end - profile.start)*1e6,
+                           'args':{'slice_cache':profile.cache, 
+                                   'unit_cache':profile.units,
+                                   'process_peak_memory':profile.peak_memory,
+                                   'read_plan':profile.readPlanSummary(),
+                                   'redraw':profile.redraw}})
+            threads[profile.tid] = profile.thread
+            for s in profile.stages:
+                args = {k:v for k, v in s.items() 
+                        if k not in ('name', 'start', 'end', 'tid', 'thread')}
+                args['plot'] = profile.plot_id
+                events.append({'name':s['name'], 'cat':'stage', 'ph':'X', 
+                               'pid':pid, 'tid':s['tid'], 
+                               'ts':(s['start'] - self.origin)*1e6, 
+                               'dur':(s['end'] - s['start'])*1e6,
+                               'args':args})
+                threads[s['tid']] = s['thread']
+        for tid, name in threads.items():
+            events.append({'name':'thread_name', 'ph':'M', 'pid':pid, 
+                           'tid':tid, 'args':{'name':name}})
+        return events
+    
+    def saveTrace(self, path):
+        with open(path, 'w') as f:
+            json.dump({'traceEvents':self.traceEvents(), 
+                       'displayTimeUnit':'ms'}, f)
+            
+            
+class PlotProfile():
+    """Timings of the stages of one run of the plot pipeline. Stages may be
+    run on the data worker thread as well as the GUI thread."""
+    
+    def __init__(self, profiler, plot_id, label):
+        self.profiler = profiler
+        self.plot_id = plot_id
+        self.label = label
+        self.stages = []
+        self.start = time.perf_counter()
+        self.end = None
+        self.tid = threading.get_ident()
+        self.thread = threading.current_thread().name
+        self.cache = None
+        self.units = None
+        #RedrawScheduler stats
+        self.redraw = None
+        #Process-wide tracemalloc peak while the plot was made, above the 
+        #memory traced when it started
+        self.mem_start = None
+        self.peak_memory = None
+        #plan_read estimate for the slice read from the file, if any
+        self.read_plan = None
+        
+    @contextlib.contextmanager
+    def stage(self, name):
+        #Yields the stage's record, which the caller can add to 
+        #(e.g. bytes_read)
+        record = {'name':name, 'tid':threading.get_ident(), 
+                  'thread':threading.current_thread().name, 'bytes_read':0}
+        hits, misses = self.profiler.cacheCounts()
+        record['start'] = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['end'] = time.perf_counter()
+            record['ms'] = (record['end'] - record['start'])*1e3
+            new_hits, new_misses = self.profiler.cacheCounts()
+            record['cache_hits'] = new_hits - hits
+            record['cache_misses'] = new_misses - misses
+            with self.profiler.lock:
+                self.stages.append(record)
+                
+    def totals(self):
+        """{stage name: summed record} over the stages of this profile."""
+        totals = OrderedDict()
+        with self.profiler.lock:
+            stages = list(self.stages)
+        for name in PROFILE_STAGES:
+            records = [s for s in stages if s['name'] == name]
+            if len(records) == 0:
+                continue
+            totals[name] = {'ms':sum(s['ms'] for s in records),
+                            'bytes_read':sum(s['bytes_read'] for s in records),
+                            'cache_hits':sum(s['cache_hits'] for s in records),
+                            'cache_misses':sum(s['cache_misses'] for s in records)}
+        return totals
+    
+    def readPlanSummary(self):
+        #The JSON-friendly parts of the read plan
+        if self.read_plan is None:
+            return None
+        return {k:self.read_plan[k] for k in ('nchunks', 'bytes_touched', 
+                                              'bytes_returned', 'amplification')}
+    
+    def duration(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start)*1e3
+    
+    
+def profile_stage(profile, name):
+    """Context manager timing stage name of profile (which may be None, if
+    profiling is off)."""
+    if profile is None:
+        return contextlib.nullcontext({})
+    return profile.stage(name)
+
+
+def format_bytes(n):
+    for unit in ['B', 'kB', 'MB', 'GB']:
+        if abs(n) < 1024 or unit == 'GB':
+            break
+        n /= 1024
+    return ('%d ' % n if unit == 'B' else '%.1f ' % n) + unit
+
+
+#******************************************************************************
+# Headless rendering
+#******************************************************************************
+#Plots can be made without the GUI (or a display) from a plot config: a 
+#JSON-compatible dict of the plot settings. Axes are referred to by name, so 
+#one config can be used for any file with the same dimensions. Index ranges 
+#mean the same thing as the index fields in the GUI.
+PLOT_CONFIG = {'plot_type':'1D', #'1D' or '2D'
+               'axes':[], #Names of the plotted axes (horizontal, vertical)
+               'ranges':{}, #Name: [a, b] index range of plotted/averaged axes
+               'index':{}, #Name: index of each of the other axes
+               'avg':[], #Names of the averaged axes
+               'units':{}, #Name: unit each axis is shown in
+               'data_unit':None, #Unit the data is shown in
+               'filter':None, #None, 'lowpass' or 'highpass'
+               'sigma':1.0,
+               'range':None, #[min, max] of the data, or None to autorange
+               'center_zero':False,
+               'colormap':'autumn',
+               'contour':False,
+               'aspect':'auto',
+               'float32':False, #Scale and filter in single precision
+               'title':None, #None for the standard title
+               'movie_axis':None, #Axis to title movie frames by
+               'figsize':[8, 6],
+               'dpi':100}
+
+def default_plot_config():
+    return json.loads(json.dumps(PLOT_CONFIG))
+
+
+def load_plot_config(path):
+    """Load a plot config, filling in anything missing with the defaults."""
+    config = default_plot_config()
+    with open(path, 'r') as f:
+        config.update(json.load(f))
+    return config
+
+
+def save_plot_config(config, path):
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+        
+
+def num_format(n):
+    if n == int(n):
+        return '%d' % n
+    elif n > 100 or n < 0.01:
+        return '%.2E' % n
+    else:
+        return '%.2f' % n
+    
+    
+def unit_factor(native_unit, unit):
+    """Factor converting values in native_unit to unit (OGIP unit strings)."""
+    if unit is None or unit == native_unit:
+        return 1.0
+    return UNIT_CONVERTER.factor(native_unit, unit)
+
+
+def config_spec(session, config):
+    """Build the read spec (as ApplicationWindow.dataSpec does) for a plot 
+    config. Returns (spec, axes), where axes is a list of dicts describing 
+    each dimension of the data."""
+    names = [name.decode('utf-8') for name in session.data.attrs['dimensions']]
+    plotted = list(config['axes'])
+    if len(plotted) == 0:
+        plotted = names[:2] if config['plot_type'] == '2D' else names[:1]
+    for name in plotted:
+        if name not in names:
+            raise ValueError("No axis named " + name + " in " + session.filepath)
+    if config['plot_type'] == '2D' and (len(plotted) != 2 or plotted[0] == plotted[1]):
+        raise ValueError("2D plots need two different axes")
+    
+    axes = []
+    dslice = []
+    avg_axes = []
+    avg_dims = []
+    loaded_axes = 0
+    for i, name in enumerate(names):
+        ax = {'name':name, 'dim':i}
+        ax['ax'] = session.axis(name)
+        ax['native_unit'] = ax['ax'].unit
+        ax['unit'] = config['units'].get(name, ax['native_unit'])
+        ax['unit_factor'] = unit_factor(ax['native_unit'], ax['unit'])
+        a, b = config['ranges'].get(name, [0, len(ax['ax']) - 1])
+        a = int(config['index'].get(name, a))
+        ax['ind_a'], ax['ind_b'] = a, int(b)
+        
+        if name in plotted:
+            ax['slice'] = slice(a, int(b), 1)
+            dslice.append(ax['slice'])
+            loaded_axes += 1
+        elif name in config['avg']:
+            dslice.append(slice(a, int(b) + 1, 1))
+            avg_axes.append(loaded_axes)
+            avg_dims.append(i)
+            loaded_axes += 1
+        else:
+            dslice.append(slice(a, a + 1, 1))
+        axes.append(ax)
+        
+    def spec_axis(name):
+        ax = axes[names.index(name)]
+        return {'name':name, 'slice':ax['slice'], 
+                'unit_factor':ax['unit_factor'], 'dim':ax['dim']}
+    
+    spec = {}
+    spec['generation'] = session.generation
+    spec['dslice'] = tuple(dslice)
+    spec['avg_axes'] = tuple(avg_axes)
+    spec['avg_dims'] = tuple(avg_dims)
+    spec['avg_block_bytes'] = AVG_BLOCK_BYTES
+    spec['hax'] = spec_axis(plotted[0])
+    spec['vax'] = spec_axis(plotted[1]) if config['plot_type'] == '2D' else None
+    spec['transpose'] = (spec['vax'] is not None and 
+                         spec['vax']['dim'] > spec['hax']['dim'])
+    native_unit = session.data.attrs['unit']
+    spec['data_unit_factor'] = unit_factor(native_unit, 
+                                           config['data_unit'] or native_unit)
+    spec['filter'] = config['filter']
+    spec['sigma'] = config['sigma']
+    spec['float32'] = config['float32']
+    return spec, axes
+
+
+def config_title(filepath, config, axes):
+    """The standard plot title (see ApplicationWindow.plotTitle)."""
+    if config['title'] is not None:
+        return config['title']
+    
+    #Movie frames are titled with the value of the movie axis
+    if config.get('movie_axis') is not None:
+        for ax in axes:
+            if ax['name'] == config['movie_axis']:
+                val = ax['ax'][ax['ind_a']]*ax['unit_factor']
+                return ax['name'] + ' =  {:.3f} '.format(val) + ax['unit']
+    
+    strarr = [os.path.basename(filepath)]
+    curarr = []
+    otherarr = []
+    for ax in axes:
+        a, b = ax['ind_a'], ax['ind_b']
+        if 'slice' in ax:
+            val = (num_format(ax['ax'][a]*ax['unit_factor']),
+                   num_format(ax['ax'][b]*ax['unit_factor']), ax['unit'])
+            curarr.append( ax['name'] + '=[%s,%s] %s' % val )
+        elif ax['name'] in config['avg']:
+            otherarr.append( ax['name'] + '= avg' )
+        else:
+            val = (num_format(ax['ax'][a]*ax['unit_factor']), ax['unit'])
+            otherarr.append( ax['name'] + '=%s %s' % val )
+    strarr.append( ', '.join(curarr) )
+    strarr.append( ', '.join(otherarr))
+    return '\n'.join(strarr)
+
+
+def config_range(data, config):
+    """The (min, max) data range to plot (see ApplicationWindow.dataRange)."""
+    if config['range'] is not None:
+        return tuple(config['range'])
+    datamin, datamax = data_extent(data)
+    if config['center_zero']:
+        return -datamax, datamax
+    return datamin, datamax
+
+
+def render_figure(session, config, data_range=None):
+    """Make the plot described by config for the file open in session, 
+    returning a matplotlib Figure drawn with the Agg backend. data_range
+    overrides the data range in the config."""
+    spec, axes = config_spec(session, config)
+    hax, vax, data = read_slice(session, spec)
+    data, slot = PostProcessor().process(data, spec['data_unit_factor'], 
+                                         spec['filter'], spec['sigma'],
+                                         float32=spec['float32'])
+    hax_info = axes[spec['hax']['dim']]
+    
+    figure = matplotlib.figure.Figure(figsize=config['figsize'], dpi=config['dpi'])
+    FigureCanvasAgg(figure)
+    ax = figure.subplots()
+    ax.ticklabel_format(axis='x', scilimits=(-3,3) )
+    ax.ticklabel_format(axis='y', scilimits=(-3,3) )
+    datamin, datamax = data_range if data_range is not None else config_range(data, config)
+    data_unit = config['data_unit'] or session.data.attrs['unit']
+    
+    if vax is None:
+        ax.plot(hax, data, linestyle='-')
+        ax.set_ylim(datamin, datamax)
+        ax.set_ylabel('(' + str(data_unit) + ')')
+    else:
+        vax_info = axes[spec['vax']['dim']]
+        colormap = get_colormap(config['colormap'])
+        absmax = max(abs(x) for x in data_extent(data))
+        if absmax > 100 or absmax < 0.01:
+            cbformat = '%.1e'
+        else:
+            cbformat = '%.1f'
+            
+        if config['contour']:
+            levels = np.linspace(datamin, datamax, num=50)
+            cs = ax.contourf(hax, vax, data, levels, cmap=colormap)
+            ax.set_aspect(config['aspect'])
+        else:
+            cs = ax.imshow(data, origin='lower', vmin=datamin, vmax=datamax,
+                           aspect=config['aspect'], interpolation='nearest',
+                           extent=[hax[0], hax[-1], vax[0], vax[-1]],
+                           cmap=colormap)
+        cbar = figure.colorbar(cs, orientation='horizontal', format=cbformat)
+        cbar.ax.set_xlabel('(' + str(data_unit) + ')')
+        ax.set_ylabel(str(vax_info['name']) + ' (' + str(vax_info['unit']) + ')')
+        
+    ax.set_xlabel(str(hax_info['name']) + ' (' + str(hax_info['unit']) + ')')
+    ax.set_title(config_title(session.filepath, config, axes))
+    return figure
+
+
+def render_file(filepath, config, output):
+    """Render the plot described by config for one file, saving it to 
+    output (any format matplotlib can save)."""
+    session = H5Session(filepath)
+    try:
+        figure = render_figure(session, config)
+        figure.savefig(output)
+    finally:
+        session.close()
+        
+
+def render_task(filepath, config, output):
+    """Render one file for render_batch, returning a manifest entry with 
+    the time taken and any error instead of raising."""
+    entry = {'file':filepath, 'output':output, 'error':None}
+    start = time.perf_counter()
+    try:
+        render_file(filepath, config, output)
+    except Exception:
+        entry['output'] = None
+        entry['error'] = traceback.format_exc()
+    entry['seconds'] = time.perf_counter() - start
+    return entry
+
+
+def render_movie_frames(filepath, config, axis, indices, outputs):
+    """Render movie frames, stepping the index of one axis through indices,
+    opening the file only once. Returns a manifest entry for each frame, as 
+    render_task does. Frames with an output of None aren't saved, instead
+    their RGBA pixels are returned in the entry's 'frame'."""
+    entries = []
+    session = H5Session(filepath)
+    try:
+        for ind, output in zip(indices, outputs):
+            entry = {'file':filepath, 'index':int(ind), 'output':output, 
+                     'error':None, 'frame':None}
+            start = time.perf_counter()
+            try:
+                config['index'][axis] = int(ind)
+                figure = render_figure(session, config)
+                if output is None:
+                    figure.canvas.draw()
+                    entry['frame'] = np.asarray(figure.canvas.buffer_rgba()).copy()
+                else:
+                    figure.savefig(output)
+            except Exception:
+                entry['output'] = None
+                entry['error'] = traceback.format_exc()
+            entry['seconds'] = time.perf_counter() - start
+            entries.append(entry)
+    finally:
+        session.close()
+    return entries
+
+
+#Movie export formats: file extension (None for separate PNG frames)
+MOVIE_FORMATS = OrderedDict([('PNG Frames', None), ('MP4', 'mp4'), 
+                             ('WebM', 'webm'), ('GIF', 'gif'), ('APNG', 'png')])
+#Formats encoded by ffmpeg, and the codecs offered for each
+MOVIE_CODECS = {'mp4':['libx264', 'mpeg4', 'libx265'],
+                'webm':['libvpx-vp9', 'libvpx']}
+#Most frames sent back from a worker at once when exporting a movie
+MOVIE_CHUNK_FRAMES = 16
+
+def find_ffmpeg():
+    return shutil.which('ffmpeg')
+
+
+class MovieWriter():
+    """Encodes frames (HxWx4 RGBA arrays, all the same size) into a movie 
+    file as they are written. mp4 and webm files are encoded by piping the
+    raw frames to ffmpeg. gif and png (APNG) files are made with Pillow, 
+    which needs every frame in memory until close()."""
+    
+    def __init__(self, path, fps=10, codec=None):
+        self.path = path
+        self.fps = fps
+        self.ext = os.path.splitext(path)[1].lower().lstrip('.')
+        self.codec = codec
+        if self.codec is None and self.ext in MOVIE_CODECS:
+            self.codec = MOVIE_CODECS[self.ext][0]
+        self.size = None
+        self.nframes = 0
+        self.proc = None
+        self.stderr = None
+        self.images = []
+        
+        
+    def _openEncoder(self, width, height):
+        ffmpeg = find_ffmpeg()
+        if ffmpeg is None:
+            raise OSError("ffmpeg is needed to save ." + self.ext + " movies")
+        #Frames go in as raw RGBA. Most codecs need even dimensions, so pad
+        #the frames by a pixel if necessary.
+        cmd = [ffmpeg, '-y', '-loglevel', 'error',
+               '-f', 'rawvideo', '-pix_fmt', 'rgba', 
+               '-s', str(width) + 'x' + str(height), '-r', str(self.fps),
+               '-i', '-',
+               '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+               '-c:v', self.codec, '-pix_fmt', 'yuv420p', self.path]
+        self.stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, 
+                                     stderr=self.stderr)
+        
+        
+    def write(self, frame):
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        if self.size is None:
+            self.size = frame.shape[:2]
+            if self.ext in MOVIE_CODECS:
+                self._openEncoder(frame.shape[1], frame.shape[0])
+        elif frame.shape[:2] != self.size:
+            raise ValueError("Movie frames must all be the same size")
+            
+        if self.proc is not None:
+            try:
+                self.proc.stdin.write(frame.tobytes())
+            except BrokenPipeError:
+                self.close()
+        else:
+            from PIL import Image
+            image = Image.fromarray(frame[..., :3])
+            if self.ext == 'gif':
+                #Palette images are a quarter of the memory
+                image = image.quantize(colors=256)
+            self.images.append(image)
+        self.nframes += 1
+        
+        
+    def close(self):
+        if self.proc is not None:
+            proc, self.proc = self.proc, None
+            proc.stdin.close()
+            if proc.wait() != 0:
+                self.stderr.seek(0)
+                message = self.stderr.read().decode(errors='replace')
+                raise OSError("ffmpeg failed: " + message)
+            self.stderr.close()
+        elif len(self.images) > 0:
+            images, self.images = self.images, []
+            images[0].save(self.path, save_all=True, append_images=images[1:],
+                           duration=int(round(1000/self.fps)), loop=0)
+            
+
+def batch_outputs(files, outdir=None, ext='.png'):
+    """Output path for each file: the same name with ext, in outdir if given
+    (otherwise next to the file)."""
+    outputs = []
+    for filepath in files:
+        name = os.path.splitext(os.path.basename(filepath))[0] + ext
+        outputs.append(os.path.join(outdir or os.path.dirname(filepath), name))
+    return outputs
+
+
+def render_batch(files, config, outdir=None, workers=None, manifest=None,
+                 progress=None):
+    """Render the same plot config for many files, spread over a pool of
+    worker processes (workers defaults to the number of CPUs). A manifest
+    of how long each file took and any errors is returned, and saved to 
+    manifest (JSON) if given. progress(done, total) is called as each 
+    file finishes."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(files)))
+    if outdir is not None:
+        os.makedirs(outdir, exist_ok=True)
+    outputs = batch_outputs(files, outdir)
+    
+    start = time.perf_counter()
+    entries = []
+    if workers == 1:
+        for filepath, output in zip(files, outputs):
+            entries.append(render_task(filepath, config, output))
+            if progress is not None:
+                progress(len(entries), len(files))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(render_task, filepath, config, output)
+                       for filepath, output in zip(files, outputs)]
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    entries.append(future.result())
+                except Exception:
+                    #The worker process itself died
+                    filepath = files[futures.index(future)]
+                    entries.append({'file':filepath, 'output':None, 
+                                    'error':traceback.format_exc(), 
+                                    'seconds':None})
+                if progress is not None:
+                    progress(len(entries), len(files))
+    entries.sort(key=lambda entry: files.index(entry['file']))
+    
+    result = {'config':config,
+              'workers':workers,
+              'seconds':time.perf_counter() - start,
+              'rendered':sum(entry['error'] is None for entry in entries),
+              'failed':sum(entry['error'] is not None for entry in entries),
+              'files':entries}
+    if manifest is not None:
+        with open(manifest, 'w') as f:
+            json.dump(result, f, indent=2)
+    return result
+
+
+def expand_files(patterns):
+    """Expand any glob patterns in a list of file names (the Windows shell
+    doesn't), dropping duplicates."""
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for filepath in matches:
+            if filepath not in files:
+                files.append(filepath)
+    return files
+
+
+def render_main(argv=None):
+    """Command line entry point (dataview-render)."""
+    parser = argparse.ArgumentParser(prog='dataview-render',
+                                     description='Make dataview plots without the GUI.')
+    parser.add_argument('files', nargs='+', 
+                        help='HDF5 files to plot (glob patterns are expanded)')
+    parser.add_argument('-c', '--config', 
+                        help='Plot config (JSON, saved from the GUI with Save Config)')
+    parser.add_argument('-o', '--output', 
+                        help='Output file, for a single file (default: the HDF5 file name with .png)')
+    parser.add_argument('-d', '--outdir',
+                        help='Directory to save plots in (default: next to each file)')
+    parser.add_argument('-j', '--workers', type=int,
+                        help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('--manifest',
+                        help='Where to save the batch manifest (default: '
+                             'dataview_manifest.json in the output directory)')
+    parser.add_argument('--plot-type', choices=['1D', '2D'])
+    parser.add_argument('--axes', nargs='+', help='Names of the axes to plot')
+    parser.add_argument('--avg', nargs='+', help='Names of the axes to average over')
+    parser.add_argument('--colormap')
+    parser.add_argument('--dpi', type=int)
+    args = parser.parse_args(argv)
+    
+    if args.config is not None:
+        config = load_plot_config(args.config)
+    else:
+        config = default_plot_config()
+    if args.axes is not None:
+        config['axes'] = args.axes
+        if args.plot_type is None:
+            config['plot_type'] = '2D' if len(args.axes) == 2 else '1D'
+    if args.plot_type is not None:
+        config['plot_type'] = args.plot_type
+    if args.avg is not None:
+        config['avg'] = args.avg
+    if args.colormap is not None:
+        config['colormap'] = args.colormap
+    if args.dpi is not None:
+        config['dpi'] = args.dpi
+    
+    files = expand_files(args.files)
+    if len(files) == 0:
+        parser.error("No files match " + ' '.join(args.files))
+        
+    if len(files) == 1 and args.outdir is None and args.manifest is None:
+        output = args.output
+        if output is None:
+            output = batch_outputs(files)[0]
+        render_file(files[0], config, output)
+        print("Saved " + output)
+        return 0
+    
+    if args.output is not None:
+        parser.error("-o/--output is for a single file, use -d/--outdir")
+    manifest = args.manifest
+    if manifest is None:
+        manifest = os.path.join(args.outdir or os.path.dirname(files[0]), 
+                                'dataview_manifest.json')
+    
+    def progress(done, total):
+        print("Rendered " + str(done) + "/" + str(total), end='\r')
+        
+    result = render_batch(files, config, outdir=args.outdir, workers=args.workers,
+                          manifest=manifest, progress=progress)
+    print("Rendered " + str(result['rendered']) + " of " + str(len(files)) + 
+          " files in " + '{:.1f}'.format(result['seconds']) + " s with " + 
+          str(result['workers']) + " workers (" + str(result['failed']) + 
+          " failed), manifest saved to " + manifest)
+    return 0 if result['failed'] == 0 else 1
+
+
 if __name__ == "__main__":
     
+    #"python dataview.py render ..." makes a plot without the GUI
+    if len(sys.argv) > 1 and sys.argv[1] == 'render':
+        sys.exit(render_main(sys.argv[2:]))
+    
     #Check if a QApplicaiton already exists, and don't open a new one if it does
     #This helps avoid kernel crashes on exit.
     app = QtWidgets.QApplication.instance()
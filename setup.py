@@ -7,8 +7,8 @@
 from setuptools import setup
 
 def readme():
-with open('README.rst') as f:
-	return f.read()
+    with open('README.md') as f:
+        return f.read()
 
 setup(name='dataview',
       version='0.1',
@@ -23,6 +23,10 @@ setup(name='dataview',
       	'pyqt5',
       	'matplotlib',
 	'astropy',
+      	'scipy',
       	'numpy'
       ],
+      entry_points = {
+          'console_scripts': ['dataview-render=dataview.dataview:render_main']
+      },
       zip_safe = False )
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for looking up values in the axes of a file (LazyAxis).
+"""
+
+import os
+import sys
+
+import numpy as np
+import h5py
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), 'dataview'))
+
+import dataview
+
+
+def make_file(path, time):
+    with h5py.File(path, 'w') as f:
+        axis = f.create_dataset('time', data=np.asarray(time, dtype=np.float32))
+        axis.attrs['unit'] = 's'
+        data = f.create_dataset('data', data=np.zeros(len(time), dtype=np.float32))
+        data.attrs['dimensions'] = np.array(['time'], dtype='S')
+        data.attrs['unit'] = 'V'
+    return str(path)
+
+
+def test_uniform_index_reads_once(tmp_path, monkeypatch):
+    time = np.arange(10000)*4e-9
+    session = dataview.H5Session(make_file(tmp_path/'shot.hdf5', time))
+    try:
+        axis = session.axis('time')
+        assert axis.uniform
+        
+        reads = []
+        getitem = dataview.H5Session.__getitem__
+        def counted(self, name):
+            reads.append(name)
+            return getitem(self, name)
+        monkeypatch.setattr(dataview.H5Session, '__getitem__', counted)
+        
+        rng = np.random.default_rng(0)
+        for val in rng.uniform(-1e-6, 5e-5, 200):
+            assert axis.index(val) == np.argmin(np.abs(time.astype(np.float32) - val))
+        #Only the first lookup is checked against the file
+        assert len(reads) == 1
+        assert axis.array is None
+    finally:
+        session.close()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the min/max envelope long 1D traces are decimated to.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), 'dataview'))
+
+import dataview
+
+
+def check_envelope(x, y, nbins):
+    ex, ey = dataview.minmax_envelope(x, y, nbins)
+    #Two points per bin (and per leftover bin) at most, plus the ends
+    assert len(ex) <= 2*nbins + 4
+    assert np.all(np.diff(ex) > 0)
+    assert ex[0] == x[0] and ex[-1] == x[-1]
+    assert ey.min() == y.min() and ey.max() == y.max()
+    return ex, ey
+
+
+def test_envelope_of_noise():
+    rng = np.random.default_rng(0)
+    x = np.arange(10007, dtype=float)
+    y = rng.standard_normal(x.size)
+    ex, ey = check_envelope(x, y, 100)
+    np.testing.assert_array_equal(ey, y[ex.astype(int)])
+
+
+def test_envelope_with_extreme_ends():
+    #The first and last points are the min and max of their bins
+    x = np.arange(1000, dtype=float)
+    y = np.linspace(0, 1, x.size)
+    ex, ey = check_envelope(x, y, 10)
+    assert len(ex) == 20
+    
+    
+def test_envelope_of_flat_trace():
+    x = np.arange(1000, dtype=float)
+    ex, ey = check_envelope(x, np.zeros(x.size), 10)
+    assert len(ex) == 11
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for replotting a file that has been changed on disk since it was
+loaded.
+"""
+
+import os
+import sys
+
+import numpy as np
+import h5py
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), 'dataview'))
+
+import dataview
+from PyQt5 import QtWidgets
+
+
+def write_file(path, time):
+    #UCLAHEDP layout with a shots axis and the given time axis, written
+    #alongside and moved into place (as a file replaced on disk would be)
+    tmp = str(path) + '.tmp'
+    with h5py.File(tmp, 'w') as f:
+        shots = f.create_dataset('shots', data=np.arange(4, dtype=np.float32))
+        shots.attrs['unit'] = ''
+        axis = f.create_dataset('time', data=np.asarray(time, dtype=np.float32))
+        axis.attrs['unit'] = 's'
+        data = np.tile(np.asarray(time, dtype=np.float32), (4, 1))
+        dset = f.create_dataset('data', data=data)
+        dset.attrs['dimensions'] = np.array(['shots', 'time'], dtype='S')
+        dset.attrs['unit'] = 'V'
+    os.replace(tmp, str(path))
+    return str(path)
+
+
+@pytest.fixture
+def window():
+    app = QtWidgets.QApplication.instance()
+    if app is None:
+        app = QtWidgets.QApplication(sys.argv)
+    w = dataview.ApplicationWindow()
+    w.async_load = False
+    w.prefetch_depth = 0
+    w.lodAct.setChecked(False)
+    yield w
+    w.close()
+    app.processEvents()
+
+
+def test_replot_rewritten_axis(tmp_path, window):
+    w = window
+    path = write_file(tmp_path/'shot.hdf5', np.arange(16))
+    w.loadFile(path)
+    w.redraw.flush()
+    w.dropdown1.setCurrentIndex(w.dropdown1.findText('time'))
+    w.redraw.flush()
+    #The last index of the range isn't plotted
+    np.testing.assert_allclose(w.canvas_ax.lines[0].get_xdata(), np.arange(15))
+
+    #The time axis is rewritten twice as finely and over twice the length
+    time = np.arange(64)*0.5
+    write_file(path, time)
+    w.makePlot(blocking=True)
+
+    time_ax = w.axes[w.dropdown1.currentIndex()]
+    assert time_ax['indminmax'] == (0, 63)
+    #The same values as before are plotted, now indexed in the new axis
+    a, b = int(time_ax['ind_a'].value()), int(time_ax['ind_b'].value())
+    assert (a, b) == (0, 30)
+    np.testing.assert_allclose(w.canvas_ax.lines[0].get_xdata(), time[a:b])
+    np.testing.assert_allclose(w.canvas_ax.lines[0].get_ydata(), time[a:b])
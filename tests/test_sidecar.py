@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the overview sidecar files (build_sidecar, load_sidecar, Sidecar).
+"""
+
+import os
+import sys
+
+import numpy as np
+import h5py
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), 'dataview'))
+
+import dataview
+
+
+AXES = ['x', 'y', 'time']
+
+
+def make_file(path, shape):
+    #UCLAHEDP layout: data with dimensions and unit attributes, plus one
+    #dataset per axis
+    rng = np.random.default_rng(0)
+    names = AXES[:len(shape)]
+    with h5py.File(path, 'w') as f:
+        for name, n in zip(names, shape):
+            axis = f.create_dataset(name, data=np.arange(n, dtype=np.float32))
+            axis.attrs['unit'] = ''
+        data = f.create_dataset('data', data=rng.standard_normal(shape).astype(np.float32))
+        data.attrs['dimensions'] = np.array(names, dtype='S')
+        data.attrs['unit'] = 'V'
+    return str(path)
+
+
+def test_level_with_long_fixed_axis(tmp_path, monkeypatch):
+    #Small plotted axes (with a small minimum length so they are still
+    #decimated) and a fixed time axis at least 512 long
+    monkeypatch.setattr(dataview, 'SIDECAR_LEVEL_MIN_LENGTH', 8)
+    shape = (64, 48, 512)
+    path = make_file(tmp_path/'shot.hdf5', shape)
+    assert dataview.build_sidecar(path) is not None
+    
+    sidecar, stale = dataview.load_sidecar(path)
+    assert sidecar is not None and not stale
+    try:
+        #A 2D plot of x and y, every 4th element, at time index 100
+        dslice = (slice(0, 64, 4), slice(0, 48, 4), slice(100, 101, 1))
+        level = sidecar.findLevel(dslice)
+        assert level is not None
+        data, lslice, axes = level
+        with h5py.File(path, 'r') as f:
+            full = f['data'][0:64, 0:48, 100:101]
+        expected = dataview.block_mean(full, (4, 4, 1))
+        np.testing.assert_allclose(data[lslice], expected, rtol=1e-5)
+        np.testing.assert_allclose(axes['x'][lslice[0]], np.arange(64).reshape(16, 4).mean(axis=1))
+        
+        #A read at full resolution along a plotted axis can't use a level
+        assert sidecar.findLevel((slice(0, 64, 1), slice(0, 48, 4), 
+                                  slice(100, 101, 1))) is None
+    finally:
+        sidecar.close()
+
+
+def test_levels_with_rows_over_block_bytes(tmp_path, monkeypatch):
+    #Each row of the first axis (64 float32 values) is bigger than 
+    #block_bytes, so the slabs can't be kept within it
+    monkeypatch.setattr(dataview, 'SIDECAR_LEVEL_MIN_LENGTH', 4)
+    path = make_file(tmp_path/'shot.hdf5', (32, 64))
+    assert dataview.build_sidecar(path, block_bytes=200) is not None
+    
+    with h5py.File(path, 'r') as f:
+        full = f['data'][...]
+    nlevels = 0
+    with h5py.File(dataview.sidecar_path(path), 'r') as f:
+        for pyramid in f['levels'].values():
+            for grp in pyramid.values():
+                expected = dataview.block_mean(full, tuple(grp.attrs['factors']))
+                np.testing.assert_allclose(grp['data'][...], expected, 
+                                           rtol=1e-5, atol=1e-6)
+                nlevels += 1
+    assert nlevels > 1
+
+
+def test_sidecar_missing_attrs_is_stale(tmp_path):
+    path = make_file(tmp_path/'shot.hdf5', (4, 8, 16))
+    assert dataview.build_sidecar(path) is not None
+    #As if written partway through, or by an older build
+    with h5py.File(dataview.sidecar_path(path), 'a') as f:
+        del f.attrs['source_hash']
+        del f.attrs['source_mtime_ns']
+    sidecar, stale = dataview.load_sidecar(path)
+    assert sidecar is None and stale